@@ -0,0 +1,131 @@
+import os
+import stat
+import threading
+import time
+import yaml
+from core.k8s_cli_wrapper import K8sCLI, get_kubeconfig
+
+try:
+    from yaml import CSafeLoader as _SafeLoader
+except ImportError:
+    from yaml import SafeLoader as _SafeLoader
+
+try:
+    from kubernetes import client, config
+    K8S_AVAILABLE = True
+except ImportError:
+    K8S_AVAILABLE = False
+
+# How long a kubeconfig path lookup is trusted before scanning the candidates again
+KUBECONFIG_TTL = 30
+
+# Sized for the long-lived informer watches plus the concurrent listings, so none
+# of them has to wait for (or discard) a pooled connection. The default is 4.
+CONNECTION_POOL_MAXSIZE = 16
+
+# (connect, read) timeout in seconds for one-off API calls
+REQUEST_TIMEOUT = (2, 4)
+
+_API_CACHE = {}
+_API_LOCK = threading.Lock()
+_KUBECONFIG_CACHE = {'path': None, 'expires': 0}
+_PARSED_CACHE = {}
+_PARSED_LOCK = threading.Lock()
+
+
+def _is_readable_file(path):
+    # One stat instead of separate exists/access/getsize calls
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    return stat.S_ISREG(st.st_mode) and st.st_size > 0 and bool(st.st_mode & 0o444)
+
+
+def get_kubeconfig_cached():
+    """Returns the kubeconfig path, re-running the filesystem scan at most every KUBECONFIG_TTL seconds."""
+    now = time.monotonic()
+    if now < _KUBECONFIG_CACHE['expires']:
+        return _KUBECONFIG_CACHE['path']
+    # $KUBECONFIG wins as it does for kubectl, so skip core's candidate scan when it is usable
+    path = os.environ.get('KUBECONFIG')
+    if not path or not _is_readable_file(path):
+        path = get_kubeconfig()
+    _KUBECONFIG_CACHE['path'] = path
+    _KUBECONFIG_CACHE['expires'] = now + KUBECONFIG_TTL
+    return path
+
+
+def load_kubeconfig_cached(kconfig=None):
+    """Returns (path, parsed kubeconfig dict), re-parsing only when the file's mtime or size changes."""
+    if kconfig is None:
+        kconfig = get_kubeconfig_cached()
+    if not kconfig:
+        return kconfig, None
+    st = os.stat(kconfig)
+    key = (kconfig, st.st_mtime_ns, st.st_size)
+    parsed = _PARSED_CACHE.get(key)
+    if parsed is None:
+        with open(kconfig, 'r') as f:
+            parsed = yaml.load(f, Loader=_SafeLoader)
+        with _PARSED_LOCK:
+            _PARSED_CACHE.clear()
+            _PARSED_CACHE[key] = parsed
+    return kconfig, parsed
+
+
+def config_key(kconfig):
+    try:
+        return (kconfig, os.stat(kconfig).st_mtime_ns)
+    except (OSError, TypeError):
+        return (kconfig, None)
+
+
+def get_apis(kconfig=None):
+    """
+    Returns the API objects for a kubeconfig, built once per (path, mtime).
+    Reusing them keeps the underlying connection pool and TLS sessions alive between polls.
+    """
+    if kconfig is None:
+        kconfig = get_kubeconfig_cached()
+    key = config_key(kconfig)
+    apis = _API_CACHE.get(key)
+    if apis is not None:
+        return apis
+
+    with _API_LOCK:
+        apis = _API_CACHE.get(key)
+        if apis is not None:
+            return apis
+
+        apis = {'cli': K8sCLI(), 'context': None}
+        if K8S_AVAILABLE and kconfig:
+            conf = client.Configuration()
+            config.load_kube_config(config_file=kconfig, client_configuration=conf)
+            conf.connection_pool_maxsize = CONNECTION_POOL_MAXSIZE
+            # Fail fast instead of stacking urllib3 retries; the connectivity error cache handles retrying
+            conf.retries = 0
+            apis['configuration'] = conf
+            api_client = client.ApiClient(conf)
+            apis['api_client'] = api_client
+            apis['v1'] = client.CoreV1Api(api_client)
+            apis['apps'] = client.AppsV1Api(api_client)
+            apis['version'] = client.VersionApi(api_client)
+
+        # A changed kubeconfig replaces every older entry
+        _API_CACHE.clear()
+        _API_CACHE[key] = apis
+        return apis
+
+
+def get_current_context(kconfig=None):
+    if kconfig is None:
+        kconfig = get_kubeconfig_cached()
+    apis = get_apis(kconfig)
+    if apis['context'] is None and kconfig:
+        # Read it from the cached parse instead of having the client re-read the file
+        try:
+            apis['context'] = load_kubeconfig_cached(kconfig)[1].get('current-context')
+        except Exception:
+            pass
+    return apis['context']
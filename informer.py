@@ -0,0 +1,358 @@
+import json
+import logging
+import threading
+from datetime import datetime
+from .client import get_apis, config_key
+
+logger = logging.getLogger(__name__)
+
+try:
+    from kubernetes import watch
+    K8S_AVAILABLE = True
+except ImportError:
+    K8S_AVAILABLE = False
+
+# Each watch is closed by the API server after this many seconds and the kind is
+# re-listed, which reconciles any events missed while the stream was open.
+RESYNC_PERIOD = 60
+# Delay before retrying a kind whose list or watch failed
+RETRY_DELAY = 5
+# Page size for the initial list, and the per-page request timeout in seconds
+LIST_PAGE_SIZE = 200
+LIST_TIMEOUT = 10
+
+# kind -> (api name, list method)
+WATCHED_KINDS = {
+    'namespaces': ('v1', 'list_namespace'),
+    'pods': ('v1', 'list_pod_for_all_namespaces'),
+    'deployments': ('apps', 'list_deployment_for_all_namespaces'),
+    'services': ('v1', 'list_service_for_all_namespaces'),
+    'configmaps': ('v1', 'list_config_map_for_all_namespaces'),
+    'secrets': ('v1', 'list_secret_for_all_namespaces'),
+    'events': ('v1', 'list_event_for_all_namespaces'),
+    'nodes': ('v1', 'list_node'),
+}
+
+
+def _object_key(obj):
+    return (obj.metadata.namespace or '', obj.metadata.name)
+
+
+def strip_secret_data(secrets):
+    """Drops secret values in place, keeping the keys the Secrets tab lists."""
+    for secret in secrets:
+        data = getattr(secret, 'data', None)
+        if data:
+            secret.data = dict.fromkeys(data, '')
+    return secrets
+
+
+def _meta(obj):
+    m = obj.metadata
+    return {'name': m.name, 'namespace': m.namespace, 'creation_timestamp': m.creation_timestamp}
+
+
+def _pod_record(pod):
+    statuses = pod.status.container_statuses or []
+    return {
+        'metadata': _meta(pod),
+        'status': {
+            'phase': pod.status.phase,
+            'container_statuses': [{'restart_count': s.restart_count} for s in statuses],
+        },
+    }
+
+
+def _deployment_record(dep):
+    containers = dep.spec.template.spec.containers or []
+    return {
+        'metadata': _meta(dep),
+        'spec': {
+            'replicas': dep.spec.replicas,
+            'template': {'spec': {'containers': [{'image': c.image} for c in containers]}},
+        },
+        'status': {'ready_replicas': dep.status.ready_replicas},
+    }
+
+
+def _service_record(svc):
+    ports = svc.spec.ports or []
+    return {
+        'metadata': _meta(svc),
+        'spec': {
+            'type': svc.spec.type,
+            'cluster_ip': svc.spec.cluster_ip,
+            'ports': [{'port': p.port, 'protocol': p.protocol, 'target_port': p.target_port} for p in ports],
+        },
+    }
+
+
+def _keys_record(obj):
+    # Only the keys are listed; secret values never reach the mirror
+    return {'metadata': _meta(obj), 'type': getattr(obj, 'type', None), 'data': dict.fromkeys(obj.data or {}, '')}
+
+
+def _event_record(event):
+    involved = {'kind': event.involved_object.kind, 'name': event.involved_object.name}
+    return {
+        'metadata': _meta(event),
+        'type': event.type,
+        'reason': event.reason,
+        'message': event.message,
+        'last_timestamp': event.last_timestamp,
+        'involved_object': involved,
+        # Spelling used by the Events search field
+        'involvedObject': involved,
+    }
+
+
+def _node_record(node):
+    return {
+        'metadata': {'name': node.metadata.name, 'labels': node.metadata.labels or {}},
+        'status': {
+            'conditions': [{'type': c.type, 'status': c.status} for c in node.status.conditions or []],
+            'addresses': [{'type': a.type, 'address': a.address} for a in node.status.addresses or []],
+            'node_info': {'kubelet_version': node.status.node_info.kubelet_version if node.status.node_info else None},
+        },
+    }
+
+
+# kind -> builder for the plain record stored in the mirror. Records keep the attribute
+# paths the partials read, so templates resolve them with dict lookups instead of walking
+# the client models, plus top-level name/namespace for filtering and search.
+_RECORD_BUILDERS = {
+    'namespaces': lambda ns: {'metadata': {'name': ns.metadata.name}},
+    'pods': _pod_record,
+    'deployments': _deployment_record,
+    'services': _service_record,
+    'configmaps': _keys_record,
+    'secrets': _keys_record,
+    'events': _event_record,
+    'nodes': _node_record,
+}
+
+
+def to_record(kind, obj):
+    record = _RECORD_BUILDERS[kind](obj)
+    record['name'] = obj.metadata.name
+    record['namespace'] = obj.metadata.namespace
+    record['resource_version'] = obj.metadata.resource_version
+    return record
+
+
+def _parse_timestamp(value):
+    return datetime.fromisoformat(value.replace('Z', '+00:00')) if value else None
+
+
+def _raw_keys_record(item):
+    m = item['metadata']
+    return {
+        'metadata': {'name': m['name'], 'namespace': m.get('namespace'),
+                     'creation_timestamp': _parse_timestamp(m.get('creationTimestamp'))},
+        'type': item.get('type'),
+        'data': dict.fromkeys(item.get('data') or {}, ''),
+        'name': m['name'],
+        'namespace': m.get('namespace'),
+        'resource_version': m.get('resourceVersion'),
+    }
+
+
+def _raw_namespace_record(item):
+    m = item['metadata']
+    return {'metadata': {'name': m['name']}, 'name': m['name'], 'namespace': None,
+            'resource_version': m.get('resourceVersion')}
+
+
+# kind -> builder for kinds whose initial list is read as raw JSON, so ConfigMap and
+# Secret values (only counted by key) are never turned into client models
+_RAW_LIST_KINDS = {
+    'configmaps': _raw_keys_record,
+    'secrets': _raw_keys_record,
+    'namespaces': _raw_namespace_record,
+}
+
+# Kinds the UI only needs names for; the server returns metadata alone for these
+_METADATA_LIST_PATHS = {'namespaces': '/api/v1/namespaces'}
+METADATA_ACCEPT = 'application/json;as=PartialObjectMetadataList;v=v1;g=meta.k8s.io,application/json'
+
+
+def _metadata_lister(api_client, path):
+    def list_metadata(limit, _continue, _request_timeout, _preload_content=False):
+        query = [('limit', limit)]
+        if _continue:
+            query.append(('continue', _continue))
+        return api_client.call_api(
+            path, 'GET', query_params=query, header_params={'Accept': METADATA_ACCEPT},
+            auth_settings=['BearerToken'], _return_http_data_only=True,
+            _preload_content=False, _request_timeout=_request_timeout
+        )
+    return list_metadata
+
+
+def _list_all(kind, list_fn, stop):
+    """
+    Lists a kind in pages of LIST_PAGE_SIZE, returning ({(ns, name): record}, resource_version).
+    Stops paging early once stop is set; the caller discards that partial result.
+    """
+    objects = {}
+    _continue = None
+    while True:
+        if kind in _RAW_LIST_KINDS:
+            result = json.loads(list_fn(limit=LIST_PAGE_SIZE, _continue=_continue, _request_timeout=LIST_TIMEOUT,
+                                        _preload_content=False).data)
+            for item in result['items']:
+                record = _RAW_LIST_KINDS[kind](item)
+                objects[(record['namespace'] or '', record['name'])] = record
+            _continue = result['metadata'].get('continue')
+            resource_version = result['metadata'].get('resourceVersion')
+        else:
+            result = list_fn(limit=LIST_PAGE_SIZE, _continue=_continue, _request_timeout=LIST_TIMEOUT)
+            for obj in result.items:
+                objects[_object_key(obj)] = to_record(kind, obj)
+            _continue = result.metadata._continue
+            resource_version = result.metadata.resource_version
+        if not _continue or stop.is_set():
+            return objects, resource_version
+
+
+class K8sStateCache:
+    """
+    In-process mirror of the cluster, kept current by one list+watch thread per resource kind.
+    Objects are stored as plain records (see to_record); readers get lock-guarded
+    copies and never touch the API server.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._objects = {kind: {} for kind in WATCHED_KINDS}
+        self._synced = set()
+        # Bumped on every change so readers can tell whether a kind moved since they last looked
+        self._revisions = {kind: 0 for kind in WATCHED_KINDS}
+        self._generation = 0
+        self._stop = threading.Event()
+        self._threads = []
+        self._watches = []
+        self._config_key = None
+
+    def is_running(self, kconfig):
+        with self._lock:
+            return bool(self._threads) and self._config_key == config_key(kconfig)
+
+    def is_synced(self, kconfig, kinds=None):
+        kinds = WATCHED_KINDS if kinds is None else kinds
+        with self._lock:
+            return self.is_running(kconfig) and all(kind in self._synced for kind in kinds)
+
+    def start(self, kconfig):
+        if not K8S_AVAILABLE:
+            return
+        with self._lock:
+            if self.is_running(kconfig):
+                return
+            self.stop()
+            apis = get_apis(kconfig)
+            if 'v1' not in apis:
+                return
+            self._stop = threading.Event()
+            self._generation += 1
+            self._config_key = config_key(kconfig)
+            for kind, (api_name, method) in WATCHED_KINDS.items():
+                list_fn = getattr(apis[api_name], method)
+                if kind in _METADATA_LIST_PATHS:
+                    lister = _metadata_lister(apis['api_client'], _METADATA_LIST_PATHS[kind])
+                else:
+                    lister = list_fn
+                thread = threading.Thread(
+                    target=self._run, args=(kind, lister, list_fn, self._stop),
+                    name=f'k8s-watch-{kind}', daemon=True
+                )
+                self._threads.append(thread)
+                thread.start()
+
+    def stop(self):
+        with self._lock:
+            self._stop.set()
+            for w in self._watches:
+                w.stop()
+            self._watches = []
+            self._threads = []
+            self._synced.clear()
+            self._config_key = None
+            for objects in self._objects.values():
+                objects.clear()
+
+    def revision(self, kconfig, kind):
+        """Returns an opaque token that changes whenever the kind does, or None while it is not synced."""
+        with self._lock:
+            if not self.is_synced(kconfig, (kind,)):
+                return None
+            return f'{self._generation}.{self._revisions[kind]}'
+
+    def contains(self, kconfig, kind, namespace, name):
+        """Returns whether the mirror holds the object, or None while the kind is not synced."""
+        with self._lock:
+            if not self.is_synced(kconfig, (kind,)):
+                return None
+            return (namespace or '', name) in self._objects[kind]
+
+    def resource_version(self, kconfig, kind, namespace, name):
+        """Returns the mirrored resourceVersion of one object, or None if it is unknown or the kind is not synced."""
+        with self._lock:
+            if not self.is_synced(kconfig, (kind,)):
+                return None
+            record = self._objects[kind].get((namespace or '', name))
+            return record.get('resource_version') if record else None
+
+    def snapshot(self, kind, namespace=None):
+        """Returns the kind's objects ordered by (namespace, name), optionally limited to one namespace."""
+        with self._lock:
+            objects = self._objects[kind]
+            return [objects[key] for key in sorted(objects) if not namespace or key[0] == namespace]
+
+    def _run(self, kind, lister, list_fn, stop):
+        while not stop.is_set():
+            try:
+                objects, resource_version = _list_all(kind, lister, stop)
+                with self._lock:
+                    if stop.is_set():
+                        return
+                    self._objects[kind] = objects
+                    self._revisions[kind] += 1
+                    self._synced.add(kind)
+
+                w = watch.Watch()
+                with self._lock:
+                    self._watches.append(w)
+                try:
+                    # timeout_seconds only asks the server to close the stream; the client-side timeout
+                    # makes a half-open connection raise, so the kind is unsynced and re-listed
+                    for event in w.stream(list_fn, resource_version=resource_version,
+                                          timeout_seconds=RESYNC_PERIOD,
+                                          _request_timeout=RESYNC_PERIOD + RETRY_DELAY):
+                        if stop.is_set() or event['type'] == 'ERROR':
+                            break
+                        self._apply(kind, event['type'], event['object'], stop)
+                finally:
+                    with self._lock:
+                        if w in self._watches:
+                            self._watches.remove(w)
+            except Exception as e:
+                logger.debug(f"K8s watch for {kind} failed: {e}")
+                with self._lock:
+                    self._synced.discard(kind)
+                stop.wait(RETRY_DELAY)
+
+    def _apply(self, kind, event_type, obj, stop):
+        record = to_record(kind, obj) if event_type in ('ADDED', 'MODIFIED') else None
+        with self._lock:
+            if stop.is_set():
+                return
+            objects = self._objects[kind]
+            if record is not None:
+                objects[_object_key(obj)] = record
+            elif event_type == 'DELETED':
+                objects.pop(_object_key(obj), None)
+            self._revisions[kind] += 1
+
+
+state_cache = K8sStateCache()
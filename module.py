@@ -1,43 +1,121 @@
 import subprocess
 import threading
 import os
+import pty
+import selectors
 import logging
-import yaml
 import re
 import socket
+import shutil
 import psutil
-import time
-from django.shortcuts import render, redirect
-from django.http import HttpResponse
+import functools
+import collections
+import hashlib
+from types import MappingProxyType
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.shortcuts import render
+from django.http import HttpResponse, HttpResponseNotModified
 from django.urls import path, re_path
 from core.plugin_system import BaseModule
 from core.terminal_manager import TerminalSession
 from core.utils import run_command, get_primary_ip, paginate_list
-from core.k8s_cli_wrapper import K8sCLI, get_kubeconfig
+from .client import REQUEST_TIMEOUT, config_key, get_apis, get_current_context, get_kubeconfig_cached, load_kubeconfig_cached
+from .informer import state_cache, strip_secret_data
 
 logger = logging.getLogger(__name__)
 
-try:
-    from kubernetes import client, config, stream
-    K8S_AVAILABLE = True
-except ImportError:
-    K8S_AVAILABLE = False
+# Shared pool for fanning out independent API calls
+_K8S_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix='k8s-ctx')
+
+# Matched against kubectl's raw output, so only the captured version is decoded
+_GIT_VERSION_RE = re.compile(rb'GitVersion:"(v[^"]+)"')
+_CLIENT_VERSION_RE = re.compile(rb'Client Version:\s+(v[0-9.]+)')
+
+_SERVICE_STATUS_KEY = 'k8s_kubelet_status'
+
+# Context key -> (raw data kind, search fields) for each resource tab
+_RESOURCE_LISTINGS = {
+    'k8s_pods': ('pods', ['name', 'namespace', 'status.phase']),
+    'k8s_deployments': ('deployments', ['name', 'namespace']),
+    'k8s_services': ('services', ['name', 'namespace']),
+    'k8s_configmaps': ('configmaps', ['name', 'namespace']),
+    'k8s_secrets': ('secrets', ['name', 'namespace']),
+    'k8s_events': ('events', ['message', 'reason', 'involvedObject.name']),
+    'k8s_nodes': ('nodes', ['name']),
+}
+
+# Kinds that are not namespaced and are never filtered by the namespace selector
+_CLUSTER_KINDS = ('namespaces', 'nodes')
+
+# HTMX target -> partial template it renders
+_HX_TARGETS = {key: f'core/partials/{key}.html' for key in _RESOURCE_LISTINGS}
+
+_AUTO_REFRESH = 'every 5s [this.classList.contains(\'active\') && document.activeElement.tagName !== \'INPUT\' && document.activeElement.tagName !== \'SELECT\' && document.activeElement.tagName !== \'TEXTAREA\']'
+
+# Static tab definitions, shared read-only by every render
+_RESOURCE_TABS = tuple(
+    MappingProxyType({'id': tab_id, 'label': label, 'template': f'core/partials/k8s_{tab_id}.html', 'hx_get': f'/tool/k8s/?tab=k8s_{tab_id}', 'hx_auto_refresh': _AUTO_REFRESH})
+    for tab_id, label in (
+        ('pods', 'Pods'),
+        ('deployments', 'Deployments'),
+        ('services', 'Services'),
+        ('nodes', 'Nodes'),
+        ('configmaps', 'ConfigMaps'),
+        ('secrets', 'Secrets'),
+        ('events', 'Events'),
+    )
+)
+
+# Single background worker for installs, with the ids of tools currently queued or running
+_INSTALL_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix='k8s-install')
+_INSTALL_INFLIGHT = set()
+_INSTALL_LOCK = threading.Lock()
+
+# Printed by the install script as each stage starts
+INSTALL_STAGE_MARKER = '::stage::'
+
+# Seconds a single install stage may run before the script is killed
+INSTALL_STAGE_TIMEOUT = 600
+
+# Upper bound for a single read from the shell PTY
+PTY_READ_SIZE = 65536
+
+def _check_ip_mismatch(kconfig):
+    """Returns {'config_ip', 'current_ip'} when the kubeconfig's API server is not a local address, else {}."""
+    try:
+        _, cfg = load_kubeconfig_cached(kconfig)
+        server_url = cfg['clusters'][0]['cluster']['server']
+        config_ip = urlparse(server_url).hostname
+        if config_ip and config_ip not in ['127.0.0.1', 'localhost', '::1']:
+            local_ips = []
+            for interface, addrs in psutil.net_if_addrs().items():
+                for addr in addrs:
+                    if addr.family == socket.AF_INET:
+                        local_ips.append(addr.address)
+
+            if config_ip not in local_ips:
+                return {
+                    'config_ip': config_ip,
+                    'current_ip': get_primary_ip()
+                }
+    except Exception as e:
+        logger.debug(f"Failed to check IP mismatch: {e}")
+    return {}
+
 
 class K8sSession(TerminalSession):
     def __init__(self, namespace, pod_name):
         super().__init__()
         self.namespace = namespace
         self.pod_name = pod_name
-        kconfig = get_kubeconfig()
-        config.load_kube_config(config_file=kconfig)
-        self.api = client.CoreV1Api()
         self._setup_session()
 
     def _setup_session(self):
         # We'll use kubectl exec directly via a PTY to support TTY features better
         self.master_fd, self.slave_fd = pty.openpty()
         
-        kconfig = get_kubeconfig()
+        kconfig = get_kubeconfig_cached()
         cmd = ['kubectl', 'exec', '-it', self.pod_name, '-n', self.namespace, '--', 'sh']
 
         env = os.environ.copy()
@@ -50,7 +128,7 @@ class K8sSession(TerminalSession):
             os.setsid()
             try:
                 fcntl.ioctl(0, termios.TIOCSCTTY, 0)
-            except:
+            except OSError:
                 pass
 
         self.process = subprocess.Popen(
@@ -60,40 +138,63 @@ class K8sSession(TerminalSession):
         os.close(self.slave_fd)
 
 
+    @property
+    def keep_running(self):
+        return self._keep_running
+
+    @keep_running.setter
+    def keep_running(self, value):
+        self._keep_running = value
+        # Wake run() so a stop request doesn't wait for the next byte of output
+        if not value and getattr(self, '_wakeup_w', None) is not None:
+            try:
+                os.write(self._wakeup_w, b'\0')
+            except OSError:
+                pass
+
     def run(self):
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        selector = selectors.DefaultSelector()
+        selector.register(self.master_fd, selectors.EVENT_READ)
+        selector.register(self._wakeup_r, selectors.EVENT_READ)
         try:
+            # Blocks until the pod writes output or the session is stopped; the PTY
+            # reports EOF/EIO once kubectl exits, which ends the loop as well
             while self.keep_running:
-                if self.process.poll() is not None:
-                    break
-                r, w, e = select.select([self.master_fd], [], [], 0.5)
-                if self.master_fd in r:
-                    data = os.read(self.master_fd, 4096)
-                    if data:
-                        self.add_history(data)
-                    else:
+                for key, _ in selector.select():
+                    if key.fd == self._wakeup_r:
                         break
-        except:
-            pass
+                    # PTY output is already bytes; take everything available in one read
+                    data = os.read(self.master_fd, PTY_READ_SIZE)
+                    if not data:
+                        return
+                    self.add_history(data)
+        except (OSError, ValueError) as e:
+            # EIO once kubectl exits, or a descriptor closed under us; either way the session is over
+            logger.debug(f"K8s shell session for {self.pod_name} ended: {e}")
         finally:
-            try:
-                os.close(self.master_fd)
-            except:
-                pass
+            selector.close()
+            wakeup_w, self._wakeup_w = self._wakeup_w, None
+            for fd in (self.master_fd, self._wakeup_r, wakeup_w):
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
             if self.process.poll() is None:
                 self.process.terminate()
 
     def send_input(self, data):
         try:
             os.write(self.master_fd, data.encode())
-        except:
+        except OSError:
             pass
 
     def resize(self, rows, cols):
+        import fcntl, termios, struct
         try:
-            import fcntl, termios, struct
             s = struct.pack('HHHH', rows, cols, 0, 0)
             fcntl.ioctl(self.master_fd, termios.TIOCSWINSZ, s)
-        except:
+        except (OSError, struct.error):
             pass
 
 class Module(BaseModule):
@@ -107,63 +208,107 @@ class Module(BaseModule):
 
     description = "Manage Kubernetes clusters, pods, deployments and services."
     
-    @property
+    @functools.cached_property
     def version(self):
+        # Computed once; packaged builds without .git can set it directly
+        env_version = os.environ.get('SOLSTICEOPS_K8S_VERSION')
+        if env_version:
+            return env_version
         try:
             return subprocess.check_output(['git', '-C', os.path.dirname(__file__), 'describe', '--tags', '--abbrev=0']).decode().strip()
-        except:
+        except (OSError, subprocess.CalledProcessError):
             return "1.0.0"
 
     def get_service_version(self):
+        from django.core.cache import cache
+
+        # The version only changes across upgrades or cluster switches, so cache it per kubeconfig
+        kconfig = get_kubeconfig_cached()
+        digest = hashlib.md5(repr(config_key(kconfig)).encode()).hexdigest()
+        cache_key = f'k8s_service_version_{digest}'
+        stale_key = f'k8s_service_version_stale_{digest}'
+
+        version = cache.get(cache_key)
+        if version:
+            return version
+        version = self._fetch_service_version(kconfig)
+        if version:
+            cache.set(cache_key, version, 300)
+            cache.set(stale_key, version, 1800)
+            return version
+        # Keep showing the last known version for a while if the lookup fails
+        return cache.get(stale_key)
+
+    def _fetch_service_version(self, kconfig):
         try:
-            k8s = K8sCLI()
+            apis = get_apis(kconfig)
+            if 'version' in apis:
+                try:
+                    return apis['version'].get_code(_request_timeout=REQUEST_TIMEOUT).git_version
+                except Exception:
+                    pass
+
+            k8s = apis['cli']
             info = k8s.info()
             if info:
                 return info.get('serverVersion', {}).get('gitVersion') or info.get('clientVersion', {}).get('gitVersion')
             
-            # Fallback to manual check if K8sCLI info fails
-            kconfig = get_kubeconfig()
-            env = os.environ.copy()
-            if kconfig:
-                env['KUBECONFIG'] = kconfig
-
-            cmd = ['kubectl', 'version', '--client']
-            process = run_command(cmd, capture_output=True, env=env, log_errors=False)
-            if process:
-                import re
-                output = process.decode()
-                match = re.search(r'GitVersion:"(v[^"]+)"', output)
-                if match:
-                    return match.group(1)
-                match = re.search(r'Client Version:\s+(v[0-9.]+)', output)
-                if match:
-                    return match.group(1)
+            # Neither client can tell: ask the local kubectl binary if there is one
+            if shutil.which('kubectl'):
+                env = os.environ.copy()
+                if kconfig:
+                    env['KUBECONFIG'] = kconfig
+
+                cmd = ['kubectl', 'version', '--client']
+                process = run_command(cmd, capture_output=True, env=env, log_errors=False)
+                if process:
+                    match = _GIT_VERSION_RE.search(process) or _CLIENT_VERSION_RE.search(process)
+                    if match:
+                        return match.group(1).decode('utf-8', 'replace')
         except Exception:
             pass
         return None
 
     def get_service_status(self, tool):
+        from django.core.cache import cache
+
+        # Status is polled with every tool refresh; a short TTL saves forking systemctl each time
+        status = cache.get(_SERVICE_STATUS_KEY)
+        if status is None:
+            status = self._fetch_service_status()
+            cache.set(_SERVICE_STATUS_KEY, status, 2)
+        return status
+
+    def _fetch_service_status(self):
         try:
             # Check if kubelet is active
             # Use log_errors=False to avoid cluttering logs when service is just stopped
             status_process = run_command(["systemctl", "is-active", "kubelet"], log_errors=False)
-            status = status_process.decode().strip()
-            if status == "active":
+            status = status_process.strip()
+            if status == b"active":
                 return 'running'
-            elif status in ["inactive", "failed", "deactivating"]:
+            elif status in (b"inactive", b"failed", b"deactivating"):
                 return 'stopped'
             return 'error'
         except Exception:
             return 'stopped' # Default to stopped if systemctl fails or service not found
 
+    def _systemctl(self, action):
+        from django.core.cache import cache
+
+        try:
+            run_command(["systemctl", action, "kubelet"])
+        finally:
+            cache.delete(_SERVICE_STATUS_KEY)
+
     def service_start(self, tool):
-        run_command(["systemctl", "start", "kubelet"])
+        self._systemctl("start")
 
     def service_stop(self, tool):
-        run_command(["systemctl", "stop", "kubelet"])
+        self._systemctl("stop")
 
     def service_restart(self, tool):
-        run_command(["systemctl", "restart", "kubelet"])
+        self._systemctl("restart")
 
     def get_icon_class(self):
         return "kubernetes"
@@ -178,17 +323,9 @@ class Module(BaseModule):
         return "core/modules/k8s_resource_header.html"
 
     def get_resource_tabs(self):
-        return [
-            {'id': 'pods', 'label': 'Pods', 'template': 'core/partials/k8s_pods.html', 'hx_get': '/tool/k8s/?tab=k8s_pods', 'hx_auto_refresh': 'every 5s [this.classList.contains(\'active\') && document.activeElement.tagName !== \'INPUT\' && document.activeElement.tagName !== \'SELECT\' && document.activeElement.tagName !== \'TEXTAREA\']'},
-            {'id': 'deployments', 'label': 'Deployments', 'template': 'core/partials/k8s_deployments.html', 'hx_get': '/tool/k8s/?tab=k8s_deployments', 'hx_auto_refresh': 'every 5s [this.classList.contains(\'active\') && document.activeElement.tagName !== \'INPUT\' && document.activeElement.tagName !== \'SELECT\' && document.activeElement.tagName !== \'TEXTAREA\']'},
-            {'id': 'services', 'label': 'Services', 'template': 'core/partials/k8s_services.html', 'hx_get': '/tool/k8s/?tab=k8s_services', 'hx_auto_refresh': 'every 5s [this.classList.contains(\'active\') && document.activeElement.tagName !== \'INPUT\' && document.activeElement.tagName !== \'SELECT\' && document.activeElement.tagName !== \'TEXTAREA\']'},
-            {'id': 'nodes', 'label': 'Nodes', 'template': 'core/partials/k8s_nodes.html', 'hx_get': '/tool/k8s/?tab=k8s_nodes', 'hx_auto_refresh': 'every 5s [this.classList.contains(\'active\') && document.activeElement.tagName !== \'INPUT\' && document.activeElement.tagName !== \'SELECT\' && document.activeElement.tagName !== \'TEXTAREA\']'},
-            {'id': 'configmaps', 'label': 'ConfigMaps', 'template': 'core/partials/k8s_configmaps.html', 'hx_get': '/tool/k8s/?tab=k8s_configmaps', 'hx_auto_refresh': 'every 5s [this.classList.contains(\'active\') && document.activeElement.tagName !== \'INPUT\' && document.activeElement.tagName !== \'SELECT\' && document.activeElement.tagName !== \'TEXTAREA\']'},
-            {'id': 'secrets', 'label': 'Secrets', 'template': 'core/partials/k8s_secrets.html', 'hx_get': '/tool/k8s/?tab=k8s_secrets', 'hx_auto_refresh': 'every 5s [this.classList.contains(\'active\') && document.activeElement.tagName !== \'INPUT\' && document.activeElement.tagName !== \'SELECT\' && document.activeElement.tagName !== \'TEXTAREA\']'},
-            {'id': 'events', 'label': 'Events', 'template': 'core/partials/k8s_events.html', 'hx_get': '/tool/k8s/?tab=k8s_events', 'hx_auto_refresh': 'every 5s [this.classList.contains(\'active\') && document.activeElement.tagName !== \'INPUT\' && document.activeElement.tagName !== \'SELECT\' && document.activeElement.tagName !== \'TEXTAREA\']'},
-        ]
+        return _RESOURCE_TABS
 
-    def get_context_data(self, request, tool, force_refresh=False):
+    def get_context_data(self, request, tool, force_refresh=False, targets=None):
         from django.core.cache import cache
         
         context = {
@@ -216,82 +353,29 @@ class Module(BaseModule):
             context['k8s_error'] = f"Cluster unreachable (cached): {last_error}"
             return context
         
-        if cache.get(probing_key) and not force_refresh:
-            context['k8s_info'] = "Cluster connectivity check in progress..."
-            context['is_probing'] = True
-            return context
-            
         try:
-            kconfig = get_kubeconfig()
+            kconfig = get_kubeconfig_cached()
             if not kconfig:
                 context['k8s_error'] = "No readable kubeconfig found."
                 return context
 
-            # Set a probing flag for 10 seconds while we attempt to connect
-            if not force_refresh:
-                cache.set(probing_key, True, 10)
+            # Set a probing flag for 10 seconds while we attempt to connect. cache.add is atomic,
+            # so concurrent refreshes back off instead of each waiting out the same timeout
+            if not force_refresh and not cache.add(probing_key, True, 10):
+                context['k8s_info'] = "Cluster connectivity check in progress..."
+                context['is_probing'] = True
+                return context
 
-            # Check for IP mismatch
-            try:
-                with open(kconfig, 'r') as f:
-                    cfg = yaml.safe_load(f)
-                    server_url = cfg['clusters'][0]['cluster']['server']
-                    match = re.search(r'https://([^:]+):', server_url)
-                    if match:
-                        config_ip = match.group(1)
-                        if config_ip not in ['127.0.0.1', 'localhost']:
-                            local_ips = []
-                            for interface, addrs in psutil.net_if_addrs().items():
-                                for addr in addrs:
-                                    if addr.family == socket.AF_INET:
-                                        local_ips.append(addr.address)
-                            
-                            if config_ip not in local_ips:
-                                current_ip = get_primary_ip()
-                                context['k8s_ip_mismatch'] = {
-                                    'config_ip': config_ip,
-                                    'current_ip': current_ip
-                                }
-            except Exception as e:
-                logger.debug(f"Failed to check IP mismatch: {e}")
+            # The mismatch check scans every interface, so reuse its result for a minute per kubeconfig version
+            digest = hashlib.md5(repr(config_key(kconfig)).encode()).hexdigest()
+            ip_mismatch = cache.get_or_set(f'k8s_ip_mismatch_{tool.id}_{digest}', lambda: _check_ip_mismatch(kconfig), 60)
+            if ip_mismatch:
+                context['k8s_ip_mismatch'] = ip_mismatch
 
-            k8s = K8sCLI()
-            
-            # Fetch raw data with caching
-            cache_key_raw = f'k8s_raw_data_{tool.id}'
-            raw_data = cache.get(cache_key_raw)
-            
-            if not raw_data or force_refresh:
-                # Quick connectivity check
-                namespaces = k8s.get_namespaces()
-                if not namespaces:
-                    if not k8s.info():
-                        raise Exception("Failed to connect to Kubernetes cluster.")
-                
-                raw_data = {
-                    'namespaces': namespaces,
-                    'context': k8s.get_context(),
-                    'pods': k8s.pods.list(all_namespaces=True),
-                    'deployments': k8s.deployments.list(all_namespaces=True),
-                    'services': k8s.services.list(all_namespaces=True),
-                    'configmaps': k8s.configmaps.list(all_namespaces=True),
-                    'secrets': k8s.secrets.list(all_namespaces=True),
-                    'events': k8s.events.list(all_namespaces=True),
-                    'nodes': k8s.nodes.list(),
-                    'timestamp': time.time()
-                }
-                # Cache for 5 minutes
-                cache.set(cache_key_raw, raw_data, 300)
-            
-            namespaces = raw_data['namespaces']
-            context['k8s_namespaces'] = namespaces
-            cache.delete(probing_key)
+            k8s = get_apis(kconfig)['cli']
 
-            context['k8s_context'] = raw_data['context']
-            
             if request:
                 namespace = request.GET.get('namespace')
-                all_namespaces = not bool(namespace)
 
                 # Search and Pagination
                 search_query = request.GET.get('search', '')
@@ -300,149 +384,89 @@ class Module(BaseModule):
                 target_tab = request.GET.get('tab', 'k8s_pods')
             else:
                 namespace = None
-                all_namespaces = True
                 search_query = ''
                 page = 1
                 per_page = 10
                 target_tab = 'k8s_pods'
 
+            # Only the kinds backing the requested tabs are fetched; namespaces double as the connectivity check
+            listings = targets if targets is not None else _RESOURCE_LISTINGS.keys()
+            kinds = {'namespaces'} | {_RESOURCE_LISTINGS[t][0] for t in listings if t in _RESOURCE_LISTINGS}
+
+            from_state_cache = not force_refresh and state_cache.is_synced(kconfig, kinds)
+            if from_state_cache:
+                # Served from the watch-backed mirror, already narrowed to the namespace; no API calls on this path
+                raw_data = {
+                    kind: state_cache.snapshot(kind, None if kind in _CLUSTER_KINDS else namespace)
+                    for kind in kinds
+                }
+            else:
+                # Fetch raw data with caching, one entry per kind
+                raw_keys = {kind: f'k8s_raw_{kind}_{tool.id}' for kind in kinds}
+                cached = {} if force_refresh else cache.get_many(raw_keys.values())
+                raw_data = {kind: cached[key] for kind, key in raw_keys.items() if key in cached}
+                missing = kinds - raw_data.keys()
+
+                if missing:
+                    # The listings are independent round-trips, so run them concurrently. Namespaces
+                    # double as the connectivity check and go out alongside the rest rather than first.
+                    fetched = {}
+                    calls = {
+                        'namespaces': k8s.get_namespaces,
+                        'pods': lambda: k8s.pods.list(all_namespaces=True),
+                        'deployments': lambda: k8s.deployments.list(all_namespaces=True),
+                        'services': lambda: k8s.services.list(all_namespaces=True),
+                        'configmaps': lambda: k8s.configmaps.list(all_namespaces=True),
+                        'secrets': lambda: k8s.secrets.list(all_namespaces=True),
+                        'events': lambda: k8s.events.list(all_namespaces=True),
+                        'nodes': lambda: k8s.nodes.list(),
+                    }
+                    futures = {_K8S_POOL.submit(calls[kind]): kind for kind in missing | {'namespaces'}}
+                    try:
+                        for future in as_completed(futures):
+                            fetched[futures[future]] = future.result()
+                    except Exception:
+                        # One failed listing fails the refresh; don't leave the rest queued behind it
+                        for future in futures:
+                            future.cancel()
+                        raise
+                    if not fetched['namespaces'] and not k8s.info():
+                        raise Exception("Failed to connect to Kubernetes cluster.")
+                    if 'secrets' in fetched:
+                        strip_secret_data(fetched['secrets'])
+
+                    # Cache for 5 minutes
+                    cache.set_many({raw_keys[kind]: value for kind, value in fetched.items() if kind in raw_keys}, 300)
+                    raw_data.update(fetched)
+
+                # Watch the cluster so subsequent polls are served from memory
+                state_cache.start(kconfig)
+
+            context['k8s_namespaces'] = raw_data['namespaces']
+            cache.delete(probing_key)
+
+            context['k8s_context'] = get_current_context(kconfig) or 'N/A'
+
             # Helper to filter by namespace if needed
             def filter_by_ns(items, ns):
                 if not ns: return items
                 return [i for i in items if (i.metadata.namespace if hasattr(i, 'metadata') else i.get('namespace')) == ns]
 
-            # Pods
-            pods = filter_by_ns(raw_data['pods'], namespace)
-            pod_pagination = paginate_list(
-                pods, 
-                page if target_tab == 'k8s_pods' else 1, 
-                per_page if target_tab == 'k8s_pods' else 10,
-                search_query=search_query if target_tab == 'k8s_pods' else None,
-                search_fields=['name', 'namespace', 'status.phase']
-            )
-            context['k8s_pods'] = pod_pagination['items']
-            context['pods_pagination'] = pod_pagination
-
-            # Deployments
-            deployments = filter_by_ns(raw_data['deployments'], namespace)
-            deployment_pagination = paginate_list(
-                deployments,
-                page if target_tab == 'k8s_deployments' else 1,
-                per_page if target_tab == 'k8s_deployments' else 10,
-                search_query=search_query if target_tab == 'k8s_deployments' else None,
-                search_fields=['name', 'namespace']
-            )
-            context['k8s_deployments'] = deployment_pagination['items']
-            context['deployments_pagination'] = deployment_pagination
-
-            # Services
-            services = filter_by_ns(raw_data['services'], namespace)
-            service_pagination = paginate_list(
-                services,
-                page if target_tab == 'k8s_services' else 1,
-                per_page if target_tab == 'k8s_services' else 10,
-                search_query=search_query if target_tab == 'k8s_services' else None,
-                search_fields=['name', 'namespace']
-            )
-            context['k8s_services'] = service_pagination['items']
-            context['services_pagination'] = service_pagination
-
-            # ConfigMaps
-            configmaps = filter_by_ns(raw_data['configmaps'], namespace)
-            configmap_pagination = paginate_list(
-                configmaps,
-                page if target_tab == 'k8s_configmaps' else 1,
-                per_page if target_tab == 'k8s_configmaps' else 10,
-                search_query=search_query if target_tab == 'k8s_configmaps' else None,
-                search_fields=['name', 'namespace']
-            )
-            context['k8s_configmaps'] = configmap_pagination['items']
-            context['configmaps_pagination'] = configmap_pagination
-
-            # Secrets
-            secrets = filter_by_ns(raw_data['secrets'], namespace)
-            secret_pagination = paginate_list(
-                secrets,
-                page if target_tab == 'k8s_secrets' else 1,
-                per_page if target_tab == 'k8s_secrets' else 10,
-                search_query=search_query if target_tab == 'k8s_secrets' else None,
-                search_fields=['name', 'namespace']
-            )
-            context['k8s_secrets'] = secret_pagination['items']
-            context['secrets_pagination'] = secret_pagination
-
-            # Events
-            events = filter_by_ns(raw_data['events'], namespace)
-            event_pagination = paginate_list(
-                events,
-                page if target_tab == 'k8s_events' else 1,
-                per_page if target_tab == 'k8s_events' else 10,
-                search_query=search_query if target_tab == 'k8s_events' else None,
-                search_fields=['message', 'reason', 'involvedObject.name']
-            )
-            context['k8s_events'] = event_pagination['items']
-            context['events_pagination'] = event_pagination
-
-            # Nodes
-            nodes = raw_data['nodes']
-            node_pagination = paginate_list(
-                nodes,
-                page if target_tab == 'k8s_nodes' else 1,
-                per_page if target_tab == 'k8s_nodes' else 10,
-                search_query=search_query if target_tab == 'k8s_nodes' else None,
-                search_fields=['name']
-            )
-            context['k8s_nodes'] = node_pagination['items']
-            context['nodes_pagination'] = node_pagination
-
-            # ConfigMaps
-            configmaps = k8s.configmaps.list(namespace=namespace, all_namespaces=all_namespaces)
-            configmap_pagination = paginate_list(
-                configmaps,
-                page if target_tab == 'k8s_configmaps' else 1,
-                per_page if target_tab == 'k8s_configmaps' else 10,
-                search_query=search_query if target_tab == 'k8s_configmaps' else None,
-                search_fields=['name', 'namespace']
-            )
-            context['k8s_configmaps'] = configmap_pagination['items']
-            context['configmaps_pagination'] = configmap_pagination
-
-            # Secrets
-            secrets = k8s.secrets.list(namespace=namespace, all_namespaces=all_namespaces)
-            secret_pagination = paginate_list(
-                secrets,
-                page if target_tab == 'k8s_secrets' else 1,
-                per_page if target_tab == 'k8s_secrets' else 10,
-                search_query=search_query if target_tab == 'k8s_secrets' else None,
-                search_fields=['name', 'namespace']
-            )
-            context['k8s_secrets'] = secret_pagination['items']
-            context['secrets_pagination'] = secret_pagination
-
-            # Events
-            events = k8s.events.list(namespace=namespace, all_namespaces=all_namespaces)
-            event_pagination = paginate_list(
-                events,
-                page if target_tab == 'k8s_events' else 1,
-                per_page if target_tab == 'k8s_events' else 10,
-                search_query=search_query if target_tab == 'k8s_events' else None,
-                search_fields=['message', 'reason', 'involvedObject.name']
-            )
-            context['k8s_events'] = event_pagination['items']
-            context['events_pagination'] = event_pagination
-
-            # Nodes
-            nodes = k8s.nodes.list()
-            node_pagination = paginate_list(
-                nodes,
-                page if target_tab == 'k8s_nodes' else 1,
-                per_page if target_tab == 'k8s_nodes' else 10,
-                search_query=search_query if target_tab == 'k8s_nodes' else None,
-                search_fields=['name']
-            )
-            context['k8s_nodes'] = node_pagination['items']
-            context['nodes_pagination'] = node_pagination
-            
+            for key, (kind, search_fields) in _RESOURCE_LISTINGS.items():
+                if kind not in raw_data:
+                    continue
+                items = raw_data[kind] if from_state_cache or kind in _CLUSTER_KINDS else filter_by_ns(raw_data[kind], namespace)
+                is_target = target_tab == key
+                pagination = paginate_list(
+                    items,
+                    page if is_target else 1,
+                    per_page if is_target else 10,
+                    search_query=search_query if is_target else None,
+                    search_fields=search_fields
+                )
+                context[key] = pagination['items']
+                context[f'{kind}_pagination'] = pagination
+
             context['search_query'] = search_query
             
             if namespace is not None:
@@ -456,34 +480,45 @@ class Module(BaseModule):
             context['k8s_error'] = error_msg
             cache.set(cache_key, error_msg, 30)
             cache.delete(probing_key)
+            state_cache.stop()
             
         return context
 
     def handle_hx_request(self, request, tool, target):
-        context = self.get_context_data(request, tool)
+        template = _HX_TARGETS.get(target)
+        if not template:
+            return None
+
+        # While the watch cache is synced, a partial only changes when its kind does,
+        # so the browser can revalidate with If-None-Match and skip the re-render
+        etag = None
+        if tool.status == 'installed':
+            revision = state_cache.revision(get_kubeconfig_cached(), _RESOURCE_LISTINGS[target][0])
+            if revision is not None:
+                etag = f'"{target}-{revision}-{request.user.pk}"'
+                if request.headers.get('If-None-Match') == etag:
+                    return HttpResponseNotModified()
+
+        context = self.get_context_data(request, tool, targets=[target])
         if context.get('is_probing'):
             return HttpResponse(status=204)
             
         context['tool'] = tool
-        if target == 'k8s_pods':
-            return render(request, 'core/partials/k8s_pods.html', context)
-        elif target == 'k8s_deployments':
-            return render(request, 'core/partials/k8s_deployments.html', context)
-        elif target == 'k8s_services':
-            return render(request, 'core/partials/k8s_services.html', context)
-        elif target == 'k8s_nodes':
-            return render(request, 'core/partials/k8s_nodes.html', context)
-        elif target == 'k8s_configmaps':
-            return render(request, 'core/partials/k8s_configmaps.html', context)
-        elif target == 'k8s_secrets':
-            return render(request, 'core/partials/k8s_secrets.html', context)
-        elif target == 'k8s_events':
-            return render(request, 'core/partials/k8s_events.html', context)
-        return None
+        response = render(request, template, context)
+
+        if etag and context.get('k8s_available'):
+            response['ETag'] = etag
+            response['Cache-Control'] = 'private, no-cache'
+        return response
 
     def install(self, request, tool):
         if tool.status not in ['not_installed', 'error']:
             return
+        with _INSTALL_LOCK:
+            # Coalesce double submits; parallel installers would fight over the apt lock
+            if tool.id in _INSTALL_INFLIGHT:
+                return
+            _INSTALL_INFLIGHT.add(tool.id)
 
         tool.status = 'installing'
         tool.save()
@@ -508,11 +543,37 @@ class Module(BaseModule):
                 ("Installing Network Plugin (Flannel)...", "kubectl apply -f https://github.com/flannel-io/flannel/releases/latest/download/kube-flannel.yml"),
                 ("Allowing pods on control-plane...", "kubectl taint nodes --all node-role.kubernetes.io/control-plane- || true"),
             ]
+            # All stages run in one bash process fed the script on stdin; the marker each stage
+            # prints before it starts drives current_stage, and the first failing stage aborts the script
+            script = ['set -o pipefail']
+            for index, (stage_name, command) in enumerate(stages):
+                script.append(f'echo "{INSTALL_STAGE_MARKER}{index}"')
+                # stdin carries the script itself, so keep the stage commands off it
+                script.append(f'{{ {command}\n}} < /dev/null || exit $?')
             try:
-                for stage_name, command in stages:
-                    tool.current_stage = stage_name
-                    tool.save()
-                    run_command(command, shell=True, capture_output=False, timeout=600)
+                process = subprocess.Popen(['bash', '-s'], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+                process.stdin.write('\n'.join(script).encode() + b'\n')
+                process.stdin.close()
+                watchdog = threading.Timer(INSTALL_STAGE_TIMEOUT, process.kill)
+                watchdog.start()
+                output_tail = collections.deque(maxlen=20)
+                try:
+                    for raw_line in process.stdout:
+                        line = raw_line.decode(errors='replace').rstrip()
+                        if line.startswith(INSTALL_STAGE_MARKER):
+                            # Each stage gets its own deadline
+                            watchdog.cancel()
+                            watchdog = threading.Timer(INSTALL_STAGE_TIMEOUT, process.kill)
+                            watchdog.start()
+                            tool.current_stage = stages[int(line[len(INSTALL_STAGE_MARKER):])][0]
+                            tool.save()
+                        elif line:
+                            output_tail.append(line)
+                    returncode = process.wait()
+                finally:
+                    watchdog.cancel()
+                if returncode != 0:
+                    raise Exception(f"{tool.current_stage} failed with exit code {returncode}: " + "\n".join(output_tail))
                 
                 tool.status = 'installed'
                 tool.current_stage = "Installation completed successfully"
@@ -521,12 +582,23 @@ class Module(BaseModule):
                 tool.config_data['error_log'] = str(e)
             tool.save()
 
-        threading.Thread(target=run_install).start()
+        def on_done(future):
+            with _INSTALL_LOCK:
+                _INSTALL_INFLIGHT.discard(tool.id)
+            if future.exception():
+                logger.error(f"K8s install worker crashed: {future.exception()}")
+
+        _INSTALL_POOL.submit(run_install).add_done_callback(on_done)
 
     def get_terminal_session_types(self):
         return {'k8s': K8sSession}
 
     def get_urls(self):
+        return self._urls
+
+    @functools.cached_property
+    def _urls(self):
+        # Built once per module instance; held on the instance so it goes away with it
         from . import views
         return [
             path('k8s/pod/<str:namespace>/<str:pod_name>/logs/', views.k8s_pod_logs, name='k8s_pod_logs'),
@@ -535,6 +607,7 @@ class Module(BaseModule):
             path('k8s/service/logs/download/', views.k8s_service_logs_download, name='k8s_service_logs_download'),
             path('k8s/pod/<str:namespace>/<str:pod_name>/act/<str:action>/', views.k8s_pod_action, name='k8s_pod_action'),
             path('k8s/resource/yaml/<str:resource_type>/<str:namespace>/<str:name>/', views.k8s_resource_yaml, name='k8s_resource_yaml'),
+            path('k8s/resource/apply/<str:job_id>/', views.k8s_apply_status, name='k8s_apply_status'),
             path('k8s/terminal/run/', views.k8s_terminal_run, name='k8s_terminal_run'),
             path('k8s/pod/<str:namespace>/<str:pod_name>/shell/', views.k8s_pod_shell, name='k8s_pod_shell'),
             path('k8s/deployment/<str:namespace>/<str:name>/scale/<int:replicas>/', views.k8s_deployment_scale, name='k8s_deployment_scale'),
@@ -1,14 +1,23 @@
-from django.test import TestCase, Client
-from django.urls import reverse
+from django.test import SimpleTestCase, TestCase, Client, RequestFactory, override_settings
+from django.urls import resolve, reverse
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from core.models import Tool
-from unittest.mock import patch, MagicMock
+from modules.k8s.client import REQUEST_TIMEOUT, _API_CACHE, _KUBECONFIG_CACHE
+from modules.k8s.views import _binary
+from unittest.mock import patch, MagicMock, NonCallableMagicMock
+from contextlib import ExitStack, contextmanager
 import subprocess
+import threading
+import os
+import functools
+from urllib.parse import urlencode
 
 User = get_user_model()
 
 class MockMetadata:
+    __slots__ = ('name', 'namespace', 'creation_timestamp', 'labels')
+
     def __init__(self, name, namespace):
         self.name = name
         self.namespace = namespace
@@ -16,222 +25,149 @@ class MockMetadata:
         self.labels = {}
 
 class MockStatus:
+    __slots__ = ('phase', 'container_statuses')
+
     def __init__(self, phase):
         self.phase = phase
         self.container_statuses = []
 
 class MockPod:
+    __slots__ = ('metadata', 'status')
+
     def __init__(self, name, namespace, phase):
         self.metadata = MockMetadata(name, namespace)
         self.status = MockStatus(phase)
 
+
+# Stand-in for the watch mirror: never synced, so listings take the fetch path
+UNSYNCED_STATE_CACHE = {'is_synced.return_value': False, 'revision.return_value': None}
+
+
+# Form body for the YAML apply tests, encoded once
+YAML_POST_BODY = urlencode({'yaml': 'apiVersion: v1\nkind: Pod\nmetadata:\n  name: test-pod'})
+
+
+@functools.lru_cache(maxsize=None)
+def url_for(name, **kwargs):
+    # Each URL is resolved once per run however many tests request it
+    return reverse(name, kwargs=kwargs or None)
+
+
+# Reused by every mock_kubernetes() entry; resetting is much cheaper than building fresh MagicMocks
+_CORE_API, _APPS_API = MagicMock(), MagicMock()
+
+
+@contextmanager
+def mock_kubernetes(pods=()):
+    """Patches the kubernetes client classes at once; yields (core_api, apps_api) with empty listings."""
+    core_api, apps_api = _CORE_API, _APPS_API
+    for api in (core_api, apps_api):
+        api.reset_mock(return_value=True, side_effect=True)
+    core_api.list_namespace.return_value.items = []
+    core_api.list_pod_for_all_namespaces.return_value.items = list(pods)
+    apps_api.list_deployment_for_all_namespaces.return_value.items = []
+    with patch('kubernetes.client.ApiClient'), \
+            patch('kubernetes.client.CoreV1Api', return_value=core_api), \
+            patch('kubernetes.client.AppsV1Api', return_value=apps_api):
+        yield core_api, apps_api
+
+
+# Hashing is irrelevant here; the default PBKDF2 hasher dominates per-test setup
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
 class K8sModuleTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(username='admin', password='password', email='admin@test.com')
+        cls.tool = Tool.objects.create(name="k8s", status="installed")
+
     def setUp(self):
         cache.clear()
+        _KUBECONFIG_CACHE['expires'] = 0
+        _API_CACHE.clear()
         self.client = Client()
-        self.user = User.objects.create_superuser(username='admin', password='password', email='admin@test.com')
-        self.client.login(username='admin', password='password')
-        self.tool = Tool.objects.create(name="k8s", status="installed")
+        self.client.force_login(self.user)
 
-    @patch('modules.k8s.module.K8S_AVAILABLE', True)
+    @patch('modules.k8s.client.K8S_AVAILABLE', True)
     @patch('kubernetes.config.load_kube_config')
-    @patch('kubernetes.client.ApiClient')
-    @patch('kubernetes.client.CoreV1Api')
-    @patch('kubernetes.client.AppsV1Api')
+    @patch('modules.k8s.module.state_cache', **UNSYNCED_STATE_CACHE)
     @patch('modules.k8s.module.run_command')
     @patch('django.core.cache.cache.set')
-    def test_k8s_pods_partial(self, mock_cache_set, mock_run, mock_apps, mock_v1, mock_api_client, mock_config):
+    def test_k8s_pods_partial(self, mock_cache_set, mock_run, mock_state_cache, mock_config):
         mock_run.return_value = b"active"
-        
-        # Mock CoreV1Api
-        mock_core_api = MagicMock()
-        
-        # Mock list_namespace for the connectivity check
-        mock_ns = MagicMock()
-        mock_ns.items = []
-        mock_core_api.list_namespace.return_value = mock_ns
-        
-        # Mock pods list
-        mock_pods = MagicMock()
-        mock_pods.items = [MockPod("test-pod", "default", "Running")]
-        mock_core_api.list_pod_for_all_namespaces.return_value = mock_pods
-        
-        mock_v1.return_value = mock_core_api
-        
-        # Mock AppsV1Api
-        mock_apps_api = MagicMock()
-        mock_apps_api.list_deployment_for_all_namespaces.return_value.items = []
-        mock_apps.return_value = mock_apps_api
-        
-        response = self.client.get(reverse('tool_detail', kwargs={'tool_name': 'k8s'}) + "?tab=k8s_pods", HTTP_HX_REQUEST='true')
+
+        with mock_kubernetes(pods=[MockPod("test-pod", "default", "Running")]):
+            response = self.client.get(url_for('tool_detail', tool_name='k8s') + "?tab=k8s_pods", HTTP_HX_REQUEST='true')
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, "test-pod")
 
-    @patch('modules.k8s.views.setup_k8s_client', return_value=True)
     @patch('kubernetes.client.CoreV1Api')
-    def test_k8s_pod_logs(self, mock_v1, mock_setup):
+    def test_k8s_pod_logs(self, mock_v1):
         mock_api = MagicMock()
         mock_api.read_namespaced_pod_log.return_value = "pod logs"
         mock_v1.return_value = mock_api
         
-        url = reverse('k8s_pod_logs', kwargs={'namespace': 'default', 'pod_name': 'test-pod'})
+        url = url_for('k8s_pod_logs', namespace='default', pod_name='test-pod')
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.content.decode(), "pod logs")
+        self.assertEqual(response.content, b"pod logs")
 
-    @patch('modules.k8s.views.setup_k8s_client', return_value=True)
-    @patch('kubernetes.client.CoreV1Api')
-    def test_k8s_pod_logs_download(self, mock_v1, mock_setup):
+    @patch('modules.k8s.views.get_apis')
+    def test_k8s_pod_logs_download(self, mock_get_apis):
         mock_api = MagicMock()
-        mock_api.read_namespaced_pod_log.return_value = "full pod logs"
-        mock_v1.return_value = mock_api
-        
-        url = reverse('k8s_pod_logs_download', kwargs={'namespace': 'default', 'pod_name': 'test-pod'})
+        mock_api.read_namespaced_pod_log.return_value.stream.return_value = iter([b"full ", b"pod logs"])
+        mock_get_apis.return_value = {'v1': mock_api, 'cli': MagicMock()}
+
+        url = url_for('k8s_pod_logs_download', namespace='default', pod_name='test-pod')
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
-        self.assertIn(b"full pod logs", response.content)
+        self.assertIn(b"full pod logs", b"".join(response.streaming_content))
+        self.assertFalse(mock_api.read_namespaced_pod_log.call_args[1]['_preload_content'])
+        mock_api.read_namespaced_pod_log.return_value.release_conn.assert_called_once()
 
-    @patch('modules.k8s.views.setup_k8s_client', return_value=True)
     @patch('kubernetes.client.AppsV1Api')
-    def test_k8s_deployment_scale(self, mock_apps, mock_setup):
+    def test_k8s_deployment_scale(self, mock_apps):
         mock_api = MagicMock()
         mock_apps.return_value = mock_api
         
-        url = reverse('k8s_deployment_scale', kwargs={'namespace': 'default', 'name': 'test-deploy', 'replicas': 3})
+        url = url_for('k8s_deployment_scale', namespace='default', name='test-deploy', replicas=3)
         response = self.client.get(url)
         self.assertEqual(response.status_code, 302)
         mock_api.patch_namespaced_deployment_scale.assert_called_once()
 
-    @patch('modules.k8s.views.setup_k8s_client', return_value=True)
     @patch('modules.k8s.views.run_command')
-    def test_k8s_resource_describe(self, mock_run, mock_setup):
+    def test_k8s_resource_describe(self, mock_run):
         mock_run.return_value = b"resource description"
-        url = reverse('k8s_resource_describe', kwargs={'resource_type': 'pod', 'namespace': 'default', 'name': 'test-pod'})
+        url = url_for('k8s_resource_describe', resource_type='pod', namespace='default', name='test-pod')
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
-        self.assertIn("resource description", response.content.decode())
+        self.assertIn(b"resource description", response.content)
 
-    @patch('modules.k8s.views.setup_k8s_client', return_value=True)
-    @patch('kubernetes.client.ApiClient')
-    @patch('kubernetes.client.CoreV1Api')
-    def test_k8s_resource_yaml_get(self, mock_v1, mock_api_client_class, mock_setup):
-        mock_api = MagicMock()
-        mock_pod = MagicMock()
-        mock_pod.metadata.name = "test-pod"
-        mock_api.read_namespaced_pod.return_value = mock_pod
-        mock_v1.return_value = mock_api
-        
-        # Mock sanitize_for_serialization to return a real dict
-        mock_api_client = MagicMock()
-        mock_api_client.sanitize_for_serialization.return_value = {
-            'apiVersion': 'v1',
-            'kind': 'Pod',
-            'metadata': {'name': 'test-pod'}
-        }
-        mock_api_client_class.return_value = mock_api_client
-        
-        url = reverse('k8s_resource_yaml', kwargs={'resource_type': 'pod', 'namespace': 'default', 'name': 'test-pod'})
+    @patch('modules.k8s.views.get_apis')
+    def test_k8s_resource_yaml_get(self, mock_get_apis):
+        core_api = MagicMock()
+        core_api.read_namespaced_pod.return_value.data = b'{"apiVersion": "v1", "kind": "Pod", "metadata": {"name": "test-pod"}}'
+        mock_get_apis.return_value = {'v1': core_api, 'cli': MagicMock()}
+
+        url = url_for('k8s_resource_yaml', resource_type='pod', namespace='default', name='test-pod')
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
-        self.assertIn("test-pod", response.content.decode())
+        self.assertEqual(response.content, b"apiVersion: v1\nkind: Pod\nmetadata:\n  name: test-pod\n")
+        self.assertFalse(core_api.read_namespaced_pod.call_args[1]['_preload_content'])
 
-    @patch('modules.k8s.views.setup_k8s_client', return_value=True)
     @patch('kubernetes.client.AppsV1Api')
-    def test_k8s_deployment_restart(self, mock_apps, mock_setup):
+    def test_k8s_deployment_restart(self, mock_apps):
         mock_api = MagicMock()
         mock_apps.return_value = mock_api
-        url = reverse('k8s_deployment_restart', kwargs={'namespace': 'default', 'name': 'test-deploy'})
+        url = url_for('k8s_deployment_restart', namespace='default', name='test-deploy')
         response = self.client.get(url)
         self.assertEqual(response.status_code, 302)
         mock_api.patch_namespaced_deployment.assert_called_once()
 
-    @patch('modules.k8s.module.K8S_AVAILABLE', True)
-    @patch('kubernetes.config.load_kube_config')
-    @patch('kubernetes.client.CoreV1Api')
-    @patch('kubernetes.client.AppsV1Api')
-    def test_k8s_context_data_namespace(self, mock_apps, mock_v1, mock_config):
-        from modules.k8s.module import Module
-        module = Module()
-        
-        mock_core_api = MagicMock()
-        mock_ns = MagicMock()
-        mock_ns.items = []
-        mock_core_api.list_namespace.return_value = mock_ns
-        mock_v1.return_value = mock_core_api
-        
-        mock_apps_api = MagicMock()
-        mock_apps.return_value = mock_apps_api
-        
-        request = MagicMock()
-        request.GET = {'namespace': 'test-ns'}
-        
-        with patch('modules.k8s.module.get_kubeconfig', return_value='/tmp/config'):
-            context = module.get_context_data(request, self.tool)
-            self.assertEqual(context['current_namespace'], 'test-ns')
-            mock_core_api.list_namespaced_pod.assert_called()
-
-    @patch('modules.k8s.module.K8S_AVAILABLE', False)
-    @patch('modules.k8s.module.run_command')
-    def test_k8s_module_logic(self, mock_run):
-        from modules.k8s.module import Module
-        module = Module()
-        
-        mock_run.return_value = b"Client Version: v1.29.1"
-        self.assertIn("v1.29", module.get_service_version())
-        
-        mock_run.return_value = b"active"
-        self.assertEqual(module.get_service_status(self.tool), "running")
-        
-        module.service_start(self.tool)
-        mock_run.assert_called_with(["systemctl", "start", "kubelet"])
-        
-        module.service_stop(self.tool)
-        mock_run.assert_called_with(["systemctl", "stop", "kubelet"])
-        
-        module.service_restart(self.tool)
-        mock_run.assert_called_with(["systemctl", "restart", "kubelet"])
-        
-        self.assertEqual(module.get_logs_url(self.tool), '/k8s/service/logs/')
-        
-        # Test version with newer format
-        mock_run.return_value = b'GitVersion:"v1.29.15"'
-        self.assertEqual(module.get_service_version(), "v1.29.15")
-
-        # Test version with fallback
-        mock_run.side_effect = None
-        mock_run.return_value = b"Some Version 1.2.3"
-        self.assertEqual(module.get_service_version(), "Some Version 1.2.3")
-
-        # Test version exception
-        mock_run.side_effect = Exception("version error")
-        self.assertIsNone(module.get_service_version())
-        mock_run.side_effect = None
-
-        # Test status exception
-        mock_run.side_effect = Exception("status error")
-        self.assertEqual(module.get_service_status(self.tool), "stopped")
-        mock_run.side_effect = None
-
-    @patch('modules.k8s.module.K8S_AVAILABLE', True)
-    @patch('kubernetes.config.load_kube_config')
-    @patch('kubernetes.client.VersionApi')
-    def test_k8s_module_version_api(self, mock_version, mock_config):
-        from modules.k8s.module import Module
-        module = Module()
-        
-        mock_api = MagicMock()
-        mock_api.get_code.return_value.git_version = "v1.29.2"
-        mock_version.return_value = mock_api
-        
-        with patch('modules.k8s.module.get_kubeconfig', return_value='/tmp/config'):
-            self.assertEqual(module.get_service_version(), "v1.29.2")
-
-    @patch('modules.k8s.views.setup_k8s_client', return_value=True)
     @patch('kubernetes.client.CoreV1Api')
-    def test_k8s_pod_action_delete(self, mock_v1, mock_setup):
+    def test_k8s_pod_action_delete(self, mock_v1):
         mock_api = MagicMock()
         mock_v1.return_value = mock_api
-        url = reverse('k8s_pod_action', kwargs={'namespace': 'default', 'pod_name': 'test-pod', 'action': 'delete'})
+        url = url_for('k8s_pod_action', namespace='default', pod_name='test-pod', action='delete')
         response = self.client.get(url)
         self.assertEqual(response.status_code, 302)
         mock_api.delete_namespaced_pod.assert_called_once()
@@ -239,281 +175,700 @@ class K8sModuleTest(TestCase):
     @patch('modules.k8s.views.run_command')
     def test_k8s_terminal_run(self, mock_run):
         mock_run.return_value = b"cmd output"
-        url = reverse('k8s_terminal_run')
-        response = self.client.post(url, {'command': 'ls', 'namespace': 'default', 'pod': 'test-pod'})
-        self.assertEqual(response.status_code, 200)
-        self.assertIn("cmd output", response.content.decode())
-
-    @patch('modules.k8s.views.run_command')
-    def test_k8s_service_logs_loop(self, mock_run):
-        # First service fails, second succeeds
-        import subprocess
-        mock_run.side_effect = [subprocess.CalledProcessError(1, 'journalctl'), b"k3s logs"]
-        url = reverse('k8s_service_logs')
-        response = self.client.get(url)
+        url = url_for('k8s_terminal_run')
+        response = self.client.post(url, {'command': 'ls -l', 'namespace': 'default', 'pod': 'test-pod'})
         self.assertEqual(response.status_code, 200)
-        self.assertIn("k3s logs", response.content.decode())
+        self.assertIn(b"cmd output", response.content)
+        self.assertEqual(mock_run.call_args[0][0], [_binary('kubectl'), 'exec', '-n', 'default', 'test-pod', '--', 'ls', '-l'])
+        self.assertNotIn('shell', mock_run.call_args[1])
 
-    @patch('modules.k8s.views.run_command')
-    def test_k8s_service_logs_download(self, mock_run):
-        mock_run.return_value = b"k8s logs download"
-        url = reverse('k8s_service_logs_download')
-        response = self.client.get(url)
-        self.assertEqual(response.status_code, 200)
-        self.assertIn("k8s logs download", response.content.decode())
-
-    @patch('modules.k8s.views.setup_k8s_client', return_value=True)
     @patch('kubernetes.client.CoreV1Api')
-    def test_k8s_resource_yaml_post(self, mock_v1, mock_setup):
+    def test_k8s_resource_yaml_post(self, mock_v1):
         mock_api = MagicMock()
-        mock_pod = MagicMock()
-        mock_pod.metadata.name = "test-pod"
+        mock_pod = MockPod("test-pod", "default", "Running")
         mock_api.read_namespaced_pod.return_value = mock_pod
         mock_v1.return_value = mock_api
         
-        # Mock run_command for kubectl apply
-        with patch('modules.k8s.views.run_command') as mock_run:
-            url = reverse('k8s_resource_yaml', kwargs={'resource_type': 'pod', 'namespace': 'default', 'name': 'test-pod'})
-            response = self.client.post(url, {'yaml': 'apiVersion: v1\nkind: Pod\nmetadata:\n  name: test-pod'})
-            self.assertEqual(response.status_code, 200)
+        # Mock run_command for kubectl apply; the queued apply runs inline so its outcome is ready to poll
+        with patch('modules.k8s.views.run_command') as mock_run, \
+                patch('modules.k8s.views.get_apis', return_value={'cli': MagicMock()}), \
+                patch('modules.k8s.views._cache_is_shared', return_value=True), \
+                patch('modules.k8s.views._APPLY_POOL.submit', side_effect=lambda fn, *args: fn(*args)):
+            url = url_for('k8s_resource_yaml', resource_type='pod', namespace='default', name='test-pod')
+            response = self.client.post(url, data=YAML_POST_BODY, content_type='application/x-www-form-urlencoded')
+            self.assertEqual(response.status_code, 202)
             mock_run.assert_called()
-            
+            response = self.client.get(response['Location'])
+            self.assertEqual(response.status_code, 200)
+
             # Test failure
             mock_run.side_effect = Exception("apply error")
             response = self.client.post(url, {'yaml': 'invalid'})
+            response = self.client.get(response.json()['status_url'])
             self.assertEqual(response.status_code, 500)
             self.assertIn(b"apply error", response.content)
 
-    @patch('modules.k8s.module.run_command')
-    def test_k8s_status_detection(self, mock_run):
-        mock_run.return_value = b"active"
-        from core.plugin_system import plugin_registry
-        module = plugin_registry.get_module("k8s")
-        status = module.get_service_status(self.tool)
-        self.assertEqual(status, "running")
-
-    @patch('modules.k8s.module.run_command')
-    @patch('modules.k8s.module.threading.Thread')
-    def test_k8s_install(self, mock_thread, mock_run):
-        from modules.k8s.module import Module
+        # A per-process cache can't carry the job to another worker, so the apply answers directly
+        with patch('modules.k8s.views.run_command') as mock_run, \
+                patch('modules.k8s.views.get_apis', return_value={'cli': MagicMock()}), \
+                patch('modules.k8s.views._cache_is_shared', return_value=False), \
+                patch('modules.k8s.views._APPLY_POOL.submit') as mock_submit:
+            response = self.client.post(url, data=YAML_POST_BODY, content_type='application/x-www-form-urlencoded')
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(b"updated successfully", response.content)
+            mock_run.assert_called_once()
+            mock_submit.assert_not_called()
+
+    @patch('modules.k8s.module.subprocess.Popen')
+    @patch('modules.k8s.module._INSTALL_POOL')
+    def test_k8s_install(self, mock_pool, mock_popen):
+        from modules.k8s.module import Module, INSTALL_STAGE_MARKER
         module = Module()
+        # install() saves the tool itself; only the in-memory status matters for the guard
         self.tool.status = 'not_installed'
-        self.tool.save()
-        
+
         module.install(None, self.tool)
         self.assertEqual(self.tool.status, 'installing')
-        mock_thread.assert_called_once()
+        mock_pool.submit.assert_called_once()
+        
+        # A second submit while the first is in flight is ignored
+        self.tool.status = 'error'
+        module.install(None, self.tool)
+        mock_pool.submit.assert_called_once()
         
         # Test the inner run_install function logic
-        target_func = mock_thread.call_args[1]['target']
+        target_func = mock_pool.submit.call_args[0][0]
+        done_callback = mock_pool.submit.return_value.add_done_callback.call_args[0][0]
+        done_callback(MagicMock(exception=MagicMock(return_value=None)))
         
         # Reset tool status to test execution
+        Tool.objects.filter(pk=self.tool.pk).update(status='installing')
         self.tool.status = 'installing'
-        self.tool.save()
         
+        mock_process = NonCallableMagicMock()
+        mock_process.stdout = [f"{INSTALL_STAGE_MARKER}0\n".encode()]
+        mock_process.wait.return_value = 0
+        mock_popen.return_value = mock_process
         target_func()
-        self.tool.refresh_from_db()
+        self.tool.refresh_from_db(fields=['status', 'current_stage', 'config_data'])
         self.assertEqual(self.tool.status, 'installed')
         self.assertEqual(self.tool.current_stage, "Installation completed successfully")
+        self.assertEqual(mock_popen.call_args[0][0], ['bash', '-s'])
+        self.assertIn(b"kubeadm init", mock_process.stdin.write.call_args[0][0])
         
         # Test failure
-        mock_run.side_effect = Exception("install failed")
+        mock_process.stdout = [f"{INSTALL_STAGE_MARKER}1\n".encode(), b"install failed\n"]
+        mock_process.wait.return_value = 1
         target_func()
-        self.tool.refresh_from_db()
+        self.tool.refresh_from_db(fields=['status', 'current_stage', 'config_data'])
         self.assertEqual(self.tool.status, 'error')
         self.assertIn("install failed", self.tool.config_data['error_log'])
-
-    @patch('modules.k8s.module.K8S_AVAILABLE', True)
-    @patch('modules.k8s.module.get_kubeconfig', return_value='/tmp/config')
-    @patch('kubernetes.config.load_kube_config')
-    @patch('kubernetes.stream.stream')
-    def test_k8s_session(self, mock_stream_func, mock_config, mock_get_cfg):
-        from modules.k8s.module import K8sSession
-        import threading
-        import time
-        mock_stream = MagicMock()
-        mock_stream.is_open.return_value = True
-        mock_stream.peek_stdout.side_effect = [True, False]
-        mock_stream.read_stdout.return_value = "output"
-        mock_stream.peek_stderr.return_value = False
-        mock_stream_func.return_value = mock_stream
-        
-        with patch('kubernetes.client.CoreV1Api'):
-            session = K8sSession("default", "test-pod")
-            
-            # Start run in a way we can stop it
-            def stop_session():
-                time.sleep(0.1)
-                session.keep_running = False
-            
-            threading.Thread(target=stop_session).start()
-            session.run()
-            
-            self.assertTrue(any(b"output" in h for h in session.history))
-            
-            session.send_input("ls")
-            mock_stream.write_stdin.assert_called_with("ls")
-
-    @patch('modules.k8s.module.K8S_AVAILABLE', True)
-    @patch('modules.k8s.module.get_kubeconfig', return_value='/tmp/config')
-    @patch('kubernetes.config.load_kube_config')
-    @patch('kubernetes.client.CoreV1Api')
-    def test_k8s_connectivity_error_caching(self, mock_v1, mock_config, mock_get_cfg):
-        from modules.k8s.module import Module
-        module = Module()
-        
-        mock_api = MagicMock()
-        mock_api.list_namespace.side_effect = Exception("Connection refused")
-        mock_v1.return_value = mock_api
-        
-        request = MagicMock()
-        request.GET = {}
-        
-        # First call - should set cache
-        with self.assertLogs('modules.k8s.module', level='ERROR') as cm:
-            context = module.get_context_data(request, self.tool)
-            self.assertIn("Connection refused", context['k8s_error'])
-        
-        # Second call - should use cache
-        mock_api.list_namespace.reset_mock()
-        context = module.get_context_data(request, self.tool)
-        self.assertIn("(cached)", context['k8s_error'])
-        mock_api.list_namespace.assert_not_called()
-
-    @patch('modules.k8s.module.K8S_AVAILABLE', True)
-    @patch('modules.k8s.module.get_kubeconfig', return_value='/tmp/config')
-    @patch('kubernetes.config.load_kube_config')
-    @patch('kubernetes.client.CoreV1Api')
-    def test_k8s_probing_flag(self, mock_v1, mock_config, mock_get_cfg):
-        from modules.k8s.module import Module
-        module = Module()
-        
-        cache.set(f'k8s_probing_{self.tool.id}', True)
-        context = module.get_context_data(MagicMock(), self.tool)
-        self.assertTrue(context.get('is_probing'))
-        
-        response = module.handle_hx_request(MagicMock(), self.tool, 'k8s_pods')
-        self.assertEqual(response.status_code, 204)
-
-    @patch('modules.k8s.module.K8S_AVAILABLE', False)
-    def test_k8s_not_available(self):
-        from modules.k8s.module import Module
-        module = Module()
-        context = module.get_context_data(MagicMock(), self.tool)
-        self.assertIn("not installed", context['k8s_error'])
-
-    @patch('modules.k8s.module.get_kubeconfig', return_value=None)
-    @patch('modules.k8s.module.K8S_AVAILABLE', True)
-    def test_k8s_no_config(self, mock_get_cfg):
-        from modules.k8s.module import Module
-        module = Module()
-        context = module.get_context_data(MagicMock(), self.tool)
-        self.assertIn("No readable kubeconfig", context['k8s_error'])
-
-    @patch('modules.k8s.views.K8S_AVAILABLE', False)
-    def test_k8s_views_no_k8s(self):
-        url = reverse('k8s_pod_logs', kwargs={'namespace': 'default', 'pod_name': 'test'})
+        self.assertIn("Installing dependencies...", self.tool.config_data['error_log'])
+
+    @patch('modules.k8s.client.K8S_AVAILABLE', False)
+    @patch('modules.k8s.client.K8sCLI')
+    def test_k8s_views_no_k8s(self, mock_cli):
+        # Without the Python client the views fall back to the kubectl-backed CLI wrapper
+        pod = mock_cli.return_value.pods.get.return_value
+        pod.logs.return_value = "cli logs\n"
+        url = url_for('k8s_pod_logs', namespace='default', pod_name='test')
         response = self.client.get(url)
-        self.assertEqual(response.status_code, 500)
-        self.assertIn(b"K8s not available", response.content)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"cli logs\n")
+        mock_cli.return_value.pods.get.assert_called_once_with(name='test', namespace='default')
 
-    @patch('modules.k8s.views.setup_k8s_client', return_value=True)
     @patch('kubernetes.client.CoreV1Api')
-    def test_k8s_pod_logs_error(self, mock_v1, mock_setup):
+    def test_k8s_pod_logs_error(self, mock_v1):
         mock_api = MagicMock()
         mock_api.read_namespaced_pod_log.side_effect = Exception("API error")
         mock_v1.return_value = mock_api
-        url = reverse('k8s_pod_logs', kwargs={'namespace': 'default', 'pod_name': 'test'})
+        url = url_for('k8s_pod_logs', namespace='default', pod_name='test')
         response = self.client.get(url)
         self.assertEqual(response.status_code, 500)
         self.assertIn(b"API error", response.content)
 
-    @patch('modules.k8s.views.setup_k8s_client', return_value=True)
     @patch('kubernetes.client.AppsV1Api')
-    def test_k8s_deployment_scale_error(self, mock_apps, mock_setup):
+    def test_k8s_deployment_scale_error(self, mock_apps):
         mock_api = MagicMock()
         mock_api.patch_namespaced_deployment_scale.side_effect = Exception("Scale error")
         mock_apps.return_value = mock_api
-        url = reverse('k8s_deployment_scale', kwargs={'namespace': 'default', 'name': 'test', 'replicas': 1})
+        url = url_for('k8s_deployment_scale', namespace='default', name='test', replicas=1)
         response = self.client.get(url)
         self.assertEqual(response.status_code, 500)
         self.assertIn(b"Scale error", response.content)
 
-    @patch('modules.k8s.views.setup_k8s_client', return_value=True)
-    def test_k8s_resource_yaml_invalid_type(self, mock_setup):
-        url = reverse('k8s_resource_yaml', kwargs={'resource_type': 'invalid', 'namespace': 'default', 'name': 'test'})
+    def test_k8s_resource_yaml_invalid_type(self):
+        url = url_for('k8s_resource_yaml', resource_type='invalid', namespace='default', name='test')
         response = self.client.get(url)
         self.assertEqual(response.status_code, 400)
 
     @patch('modules.k8s.views.run_command')
     def test_k8s_terminal_run_error(self, mock_run):
-        import subprocess
         mock_run.side_effect = subprocess.CalledProcessError(1, 'kubectl', output=b"Execution error")
-        url = reverse('k8s_terminal_run')
+        url = url_for('k8s_terminal_run')
         response = self.client.post(url, {'command': 'ls', 'namespace': 'default', 'pod': 'test'})
         self.assertEqual(response.status_code, 200)
-        self.assertIn("Execution error", response.content.decode())
+        self.assertIn(b"Execution error", response.content)
 
     def test_k8s_pod_shell_view(self):
-        url = reverse('k8s_pod_shell', kwargs={'namespace': 'default', 'pod_name': 'test'})
+        url = url_for('k8s_pod_shell', namespace='default', pod_name='test')
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.content.decode(), "Shell initialised")
+        self.assertEqual(response.content, b"Shell initialised")
+
+    @patch('modules.k8s.views.get_apis')
+    def test_k8s_resource_yaml_types(self, mock_get_apis):
+        core_api, apps_api = MagicMock(), MagicMock()
+        mock_get_apis.return_value = {'v1': core_api, 'apps': apps_api, 'cli': MagicMock()}
+
+        readers = [
+            ('deployment', apps_api.read_namespaced_deployment, 'Deployment'),
+            ('service', core_api.read_namespaced_service, 'Service'),
+            ('configmap', core_api.read_namespaced_config_map, 'ConfigMap'),
+            ('secret', core_api.read_namespaced_secret, 'Secret'),
+        ]
+        for resource_type, reader, kind in readers:
+            with self.subTest(resource_type=resource_type):
+                reader.return_value.data = f'{{"kind": "{kind}", "metadata": {{"name": "test", "managedFields": []}}}}'.encode()
+                url = url_for('k8s_resource_yaml', resource_type=resource_type, namespace='default', name='test')
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.content, f"kind: {kind}\nmetadata:\n  name: test\n".encode())
 
     @patch('modules.k8s.views.run_command')
-    def test_k8s_service_logs_no_entries(self, mock_run):
-        mock_run.return_value = b"No entries"
-        url = reverse('k8s_service_logs')
-        response = self.client.get(url)
+    def test_k8s_terminal_run_unbalanced_quote(self, mock_run):
+        url = url_for('k8s_terminal_run')
+        response = self.client.post(url, {'command': 'echo "it\'s', 'namespace': 'default', 'pod': 'test-pod'})
         self.assertEqual(response.status_code, 200)
-        self.assertIn(b"No log entries found", response.content)
+        self.assertIn(b"Error: No closing quotation", response.content)
 
-    @patch('modules.k8s.views.run_command')
-    def test_k8s_service_logs_error(self, mock_run):
-        # We need to trigger the outer exception in views.py
-        # The inner loop catches exceptions, so we make it fail after the loop or make the loop fail fundamentally
-        mock_run.side_effect = Exception("General error")
-        url = reverse('k8s_service_logs')
-        response = self.client.get(url)
-        self.assertEqual(response.status_code, 500)
-        self.assertIn(b"Error fetching system logs", response.content)
-
-    @patch('modules.k8s.views.setup_k8s_client', return_value=True)
-    @patch('kubernetes.client.ApiClient')
-    @patch('kubernetes.client.CoreV1Api')
-    @patch('kubernetes.client.AppsV1Api')
-    def test_k8s_resource_yaml_types(self, mock_apps, mock_v1, mock_api_client_class, mock_setup):
-        mock_api_client = MagicMock()
-        mock_api_client.sanitize_for_serialization.return_value = {'kind': 'Test'}
-        mock_api_client_class.return_value = mock_api_client
-        
-        mock_v1_api = MagicMock()
-        mock_v1.return_value = mock_v1_api
-        mock_apps_api = MagicMock()
-        mock_apps.return_value = mock_apps_api
-        
-        types = ['deployment', 'service', 'configmap', 'secret']
-        for t in types:
-            url = reverse('k8s_resource_yaml', kwargs={'resource_type': t, 'namespace': 'default', 'name': 'test'})
-            response = self.client.get(url)
-            self.assertEqual(response.status_code, 200)
+        # Host-side kubectl commands are split the same way
+        response = self.client.post(url, {'command': "get pods -l 'app=web"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"Error: No closing quotation", response.content)
+        mock_run.assert_not_called()
 
     @patch('modules.k8s.views.run_command')
     def test_k8s_terminal_run_direct(self, mock_run):
         mock_run.return_value = b"direct output"
-        url = reverse('k8s_terminal_run')
+        url = url_for('k8s_terminal_run')
         # Test direct command (no pod)
         response = self.client.post(url, {'command': 'get pods'})
         self.assertEqual(response.status_code, 200)
-        self.assertIn("kubectl get pods -A", response.content.decode())
+        self.assertIn(b"kubectl get pods -A", response.content)
         
         # Test command already starting with kubectl
         response = self.client.post(url, {'command': 'kubectl version'})
         self.assertEqual(response.status_code, 200)
-        self.assertIn("$ kubectl version", response.content.decode())
+        self.assertIn(b"$ kubectl version", response.content)
+
+        # Only a real `get` token triggers -A, and an explicit namespace suppresses it
+        for command, argv in [('get-contexts', ['get-contexts']),
+                              ('get pods --namespace=kube-system', ['get', 'pods', '--namespace=kube-system'])]:
+            self.client.post(url, {'command': command})
+            self.assertEqual(mock_run.call_args[0][0][1:], argv)
 
     @patch('modules.k8s.views.run_command')
     def test_k8s_terminal_run_invalid(self, mock_run):
-        url = reverse('k8s_terminal_run')
+        url = url_for('k8s_terminal_run')
         response = self.client.get(url)
         self.assertEqual(response.status_code, 400)
+
+
+# Views behind login_required only, called with an unsaved user so no user row or session is written
+class K8sViewRequestTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.factory = RequestFactory()
+        cls.user = User(username='admin', is_superuser=True, is_staff=True, is_active=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, url_name, **kwargs):
+        url = url_for(url_name, **kwargs)
+        request = self.factory.get(url)
+        request.user = self.user
+        return resolve(url).func(request, **kwargs)
+
+    @patch('modules.k8s.views.run_command')
+    def test_k8s_service_logs(self, mock_run):
+        def journal(outputs):
+            # The units are probed concurrently, so answer by unit rather than by call order
+            def run(cmd):
+                result = outputs[cmd[2]]
+                if isinstance(result, Exception):
+                    raise result
+                return result
+            return run
+
+        cases = [
+            # kubelet fails and microk8s has entries too, but k3s comes first
+            ('fallback', {'kubelet': subprocess.CalledProcessError(1, 'journalctl'), 'k3s': b"k3s logs",
+                          'microk8s': b"microk8s logs"}, 200, b"k3s logs"),
+            ('no_entries', dict.fromkeys(('kubelet', 'k3s', 'microk8s'), b"No entries"), 200, b"No log entries found"),
+            # A non-CalledProcessError escapes the probe and hits the outer handler
+            ('error', dict.fromkeys(('kubelet', 'k3s', 'microk8s'), Exception("General error")), 500,
+             b"Error fetching system logs"),
+        ]
+        for name, outputs, status, body in cases:
+            with self.subTest(name):
+                mock_run.reset_mock()
+                mock_run.side_effect = journal(outputs)
+                response = self.get('k8s_service_logs')
+                self.assertEqual(response.status_code, status)
+                self.assertIn(body, response.content)
+
+    @patch('modules.k8s.views.run_command')
+    def test_k8s_service_logs_remembers_unit(self, mock_run):
+        mock_run.side_effect = lambda cmd: b"k3s logs" if cmd[2] == 'k3s' else b"No entries"
+        self.get('k8s_service_logs')
+        self.assertEqual(mock_run.call_count, 3)
+
+        # The unit that answered is queried alone from then on
+        mock_run.reset_mock()
+        response = self.get('k8s_service_logs')
+        self.assertIn(b"k3s logs", response.content)
+        mock_run.assert_called_once()
+        self.assertEqual(mock_run.call_args[0][0][2], 'k3s')
+
+    @patch('modules.k8s.views.get_apis')
+    def test_k8s_pod_logs_download_window(self, mock_get_apis):
+        core_api = MagicMock()
+        core_api.read_namespaced_pod_log.return_value.stream.return_value = iter([b"recent"])
+        mock_get_apis.return_value = {'v1': core_api, 'cli': MagicMock()}
+        url = url_for('k8s_pod_logs_download', namespace='default', pod_name='test-pod')
+
+        request = self.factory.get(url, {'tail': '500', 'since': '30m'})
+        request.user = self.user
+        response = resolve(url).func(request, namespace='default', pod_name='test-pod')
+        self.assertEqual(b"".join(response.streaming_content), b"recent")
+        kwargs = core_api.read_namespaced_pod_log.call_args[1]
+        self.assertEqual((kwargs['tail_lines'], kwargs['since_seconds']), (500, 1800))
+
+        request = self.factory.get(url, {'since': 'yesterday'})
+        request.user = self.user
+        response = resolve(url).func(request, namespace='default', pod_name='test-pod')
+        self.assertEqual(response.status_code, 400)
+
+    @patch('modules.k8s.views.get_apis')
+    def test_k8s_pod_logs_download_reuses_complete_tail(self, mock_get_apis):
+        core_api = MagicMock()
+        core_api.read_namespaced_pod_log.return_value = "short log\n"
+        mock_get_apis.return_value = {'v1': core_api, 'cli': MagicMock()}
+
+        self.get('k8s_pod_logs', namespace='default', pod_name='test-pod')
+        response = self.get('k8s_pod_logs_download', namespace='default', pod_name='test-pod')
+        self.assertEqual(response.content, b"short log\n")
+        self.assertIn('attachment', response['Content-Disposition'])
+        # Only the viewer's tail read reached the API server, and it was bounded
+        core_api.read_namespaced_pod_log.assert_called_once()
+        self.assertEqual(core_api.read_namespaced_pod_log.call_args[1]['_request_timeout'], REQUEST_TIMEOUT)
+
+        # A full tail whose last line lacks a newline is not the whole log
+        cache.clear()
+        core_api.read_namespaced_pod_log.return_value = "\n".join(["line"] * 200)
+        self.get('k8s_pod_logs', namespace='default', pod_name='test-pod')
+        self.assertIsNone(cache.get('k8s_pod_log_default_test-pod'))
+
+    @patch('modules.k8s.views.state_cache')
+    @patch('modules.k8s.views.get_apis')
+    def test_k8s_pod_logs_missing_in_mirror(self, mock_get_apis, mock_state_cache):
+        mock_state_cache.contains.return_value = False
+        response = self.get('k8s_pod_logs', namespace='default', pod_name='gone')
+        self.assertEqual(response.status_code, 404)
+        mock_get_apis.assert_not_called()
+
+    @patch('modules.k8s.views.run_command')
+    @patch('modules.k8s.views.get_apis')
+    def test_k8s_resource_describe_native(self, mock_get_apis, mock_run):
+        core_api = MagicMock()
+        core_api.read_namespaced_pod.return_value.data = (
+            b'{"kind": "Pod", "metadata": {"name": "test-pod", "managedFields": [{"manager": "kubectl"}]}}'
+        )
+        event = MagicMock(type='Warning', reason='BackOff', message='Back-off restarting failed container')
+        core_api.list_namespaced_event.return_value.items = [event]
+        mock_get_apis.return_value = {'v1': core_api}
+
+        response = self.get('k8s_resource_describe', resource_type='pod', namespace='default', name='test-pod')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"name: test-pod", response.content)
+        self.assertIn(b"BackOff", response.content)
+        self.assertNotIn(b"managedFields", response.content)
+        self.assertFalse(core_api.read_namespaced_pod.call_args[1]['_preload_content'])
+        mock_run.assert_not_called()
+
+    def test_rewrite_manifest(self):
+        import re
+        import stat
+        import tempfile
+        from modules.k8s.views import _rewrite_manifest
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'kube-apiserver.yaml')
+            with open(path, 'wb') as f:
+                f.write(b"- --advertise-address=10.0.0.1\n")
+            os.chmod(path, 0o600)
+            _rewrite_manifest(path, [(re.compile(rb'--advertise-address=[0-9.]*'), b'--advertise-address=10.0.0.2')])
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(), b"- --advertise-address=10.0.0.2\n")
+            self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o600)
+            self.assertEqual(os.listdir(d), ['kube-apiserver.yaml'])
+
+    def test_run_concurrently(self):
+        from modules.k8s.views import _run_concurrently
+        import sys
+        ok = [sys.executable, '-c', 'pass']
+        _run_concurrently([ok, ok])
+        with self.assertRaises(subprocess.CalledProcessError) as ctx:
+            _run_concurrently([ok, [sys.executable, '-c', 'print("bad cert"); raise SystemExit(3)']])
+        self.assertEqual(ctx.exception.returncode, 3)
+        self.assertIn(b"bad cert", ctx.exception.output)
+
+        # A phase that outlives the deadline is killed rather than waited on forever
+        with self.assertRaises(subprocess.TimeoutExpired):
+            _run_concurrently([ok, [sys.executable, '-c', 'import time; time.sleep(30)']], timeout=0.5)
+
+        # A spawn failure still reaps the processes already started
+        started = MagicMock(returncode=None)
+        with patch('modules.k8s.views.subprocess.Popen', side_effect=[started, FileNotFoundError()]):
+            with self.assertRaises(FileNotFoundError):
+                _run_concurrently([ok, ['missing-kubeadm']])
+        started.kill.assert_called_once()
+        started.wait.assert_called_once()
+
+    @patch('modules.k8s.views.run_command')
+    @patch('modules.k8s.views.get_apis')
+    def test_k8s_apply_server_side(self, mock_get_apis, mock_run):
+        from modules.k8s.views import _apply_yaml
+        api_client = MagicMock()
+        mock_get_apis.return_value = {'api_client': api_client}
+
+        _apply_yaml('apply-status', b"apiVersion: apps/v1\nkind: Deployment\nmetadata:\n  name: web\n  namespace: default\n", {})
+        self.assertEqual(cache.get('apply-status')[0], 200)
+        args, kwargs = api_client.call_api.call_args
+        self.assertEqual(args, ('/apis/apps/v1/namespaces/default/deployments/web', 'PATCH'))
+        self.assertEqual(kwargs['header_params']['Content-Type'], 'application/apply-patch+yaml')
+        self.assertEqual(kwargs['body']['metadata']['name'], 'web')
+        # The editor overrides fields other managers own, as kubectl apply did
+        self.assertIn(('force', 'true'), kwargs['query_params'])
+        mock_run.assert_not_called()
+
+        # The API server's Status message is reported, not the whole exception
+        api_client.call_api.side_effect = type('ApiException', (Exception,), {'body': '{"message": "field is immutable"}'})()
+        _apply_yaml('apply-status', b"apiVersion: v1\nkind: Pod\nmetadata:\n  name: p\n  namespace: default\n", {})
+        self.assertEqual(cache.get('apply-status'), (500, "Update failed: field is immutable"))
+
+        # Several documents still go through kubectl
+        _apply_yaml('apply-status', b"kind: Pod\n---\nkind: Pod\n", {})
+        mock_run.assert_called_once()
+
+    @patch('modules.k8s.views.get_apis')
+    def test_k8s_resource_yaml_native(self, mock_get_apis):
+        apps_api = MagicMock()
+        apps_api.read_namespaced_deployment.return_value.data = (
+            b'{"kind": "Deployment", "metadata": {"name": "web", "managedFields": [{"manager": "kubectl"}]}}'
+        )
+        mock_get_apis.return_value = {'v1': MagicMock(), 'apps': apps_api}
+
+        response = self.get('k8s_resource_yaml', resource_type='deployment', namespace='default', name='web')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"kind: Deployment\nmetadata:\n  name: web\n")
+
+    # Without the Python client the YAML comes from kubectl
+    @patch('modules.k8s.views.get_apis', return_value={'cli': None})
+    @patch('modules.k8s.views.state_cache')
+    @patch('modules.k8s.views.run_command')
+    def test_k8s_resource_yaml_cached_by_resource_version(self, mock_run, mock_state_cache, mock_get_apis):
+        mock_run.return_value = b"kind: Pod"
+        mock_state_cache.resource_version.return_value = '42'
+
+        for _ in range(2):
+            response = self.get('k8s_resource_yaml', resource_type='pod', namespace='default', name='test-pod')
+            self.assertEqual(response.content, b"kind: Pod")
+        mock_run.assert_called_once()
+
+        # A new resourceVersion misses the cache
+        mock_state_cache.resource_version.return_value = '43'
+        self.get('k8s_resource_yaml', resource_type='pod', namespace='default', name='test-pod')
+        self.assertEqual(mock_run.call_count, 2)
+
+        # Secrets are never cached
+        for _ in range(2):
+            self.get('k8s_resource_yaml', resource_type='secret', namespace='default', name='test-secret')
+        self.assertEqual(mock_run.call_count, 4)
+
+    @patch('modules.k8s.views.subprocess.Popen')
+    def test_k8s_service_logs_download(self, mock_popen):
+        empty, journal, spare = NonCallableMagicMock(), NonCallableMagicMock(), NonCallableMagicMock()
+        # kubelet has no entries, so the download falls through to k3s; microk8s is started but dropped
+        empty.stdout.read1.return_value = b"-- No entries --"
+        journal.stdout.read1.return_value = b"k8s logs "
+        journal.stdout.read.side_effect = [b"download", b""]
+        journal.poll.return_value = 0
+        spare.poll.return_value = None
+        mock_popen.side_effect = [empty, journal, spare]
+
+        response = self.get('k8s_service_logs_download')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"k8s logs download")
+        self.assertEqual([c[0][0][2] for c in mock_popen.call_args_list], ['kubelet', 'k3s', 'microk8s'])
+        self.assertEqual(mock_popen.call_args[0][0][-2:], ['--since', '-1h'])
+        spare.stdout.read1.assert_not_called()
+        spare.kill.assert_called_once()
+        self.assertEqual(cache.get('k8s_journal_svc'), 'k3s')
+        journal.stdout.close.assert_called()
+
+
+# Module methods called directly; nothing here touches the ORM, so no per-test transaction
+class K8sModuleLogicTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Patches every test here needs, entered once for the class
+        cls._patches = ExitStack()
+        cls._patches.enter_context(patch('modules.k8s.client.K8S_AVAILABLE', True))
+        cls._patches.enter_context(patch('kubernetes.config.load_kube_config'))
+        # Never start the real watch threads against the shared API mocks
+        cls.state_cache = cls._patches.enter_context(patch('modules.k8s.module.state_cache', **UNSYNCED_STATE_CACHE))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._patches.close()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        _KUBECONFIG_CACHE['expires'] = 0
+        _API_CACHE.clear()
+        self.state_cache.reset_mock()
+        # Only the id reaches the cache keys, so the tool never needs to be saved
+        self.tool = Tool(id=1, name="k8s", status="installed")
+
+    def test_k8s_context_data_namespace(self):
+        from modules.k8s.module import Module
+        module = Module()
+
+        request = NonCallableMagicMock()
+        request.GET = {'namespace': 'test-ns'}
+
+        pods = [MockPod("ns-pod", "test-ns", "Running"), MockPod("other-pod", "default", "Running")]
+        with mock_kubernetes(pods=pods) as (mock_core_api, _), \
+                patch('modules.k8s.client.get_kubeconfig', return_value='/tmp/config'):
+            context = module.get_context_data(request, self.tool)
+            self.assertEqual(context['current_namespace'], 'test-ns')
+            # Pods are listed once across all namespaces and narrowed to the selected one
+            mock_core_api.list_pod_for_all_namespaces.assert_called_once()
+            self.assertEqual([p.metadata.name for p in context['k8s_pods']], ["ns-pod"])
+
+    def test_k8s_informer_list_stops(self):
+        from modules.k8s.informer import _list_all
+        # A MagicMock page always carries a truthy continue token; a set stop must still end the paging
+        lister = MagicMock()
+        lister.return_value.items = []
+        stop = threading.Event()
+        stop.set()
+        _list_all('deployments', lister, stop)
+        lister.assert_called_once()
+
+    @patch('modules.k8s.client.get_kubeconfig', return_value='/tmp/config')
+    @patch('modules.k8s.module.get_apis')
+    def test_k8s_context_data_from_mirror(self, mock_get_apis, mock_get_cfg):
+        from modules.k8s.module import Module
+        module = Module()
+        records = {
+            'namespaces': [{'metadata': {'name': 'test-ns'}, 'name': 'test-ns', 'namespace': None}],
+            'pods': [{'metadata': {'name': 'ns-pod', 'namespace': 'test-ns'}, 'name': 'ns-pod', 'namespace': 'test-ns'}],
+        }
+        self.state_cache.is_synced.return_value = True
+        self.state_cache.snapshot.side_effect = lambda kind, namespace=None: records.get(kind, [])
+
+        request = NonCallableMagicMock()
+        request.GET = {'namespace': 'test-ns', 'tab': 'k8s_pods'}
+        try:
+            context = module.get_context_data(request, self.tool, targets=['k8s_pods'])
+        finally:
+            self.state_cache.is_synced.return_value = False
+            self.state_cache.snapshot.side_effect = None
+
+        # Synced kinds come straight from the mirror, already narrowed to the namespace
+        self.assertEqual(context['k8s_pods'], records['pods'])
+        self.assertEqual(context['k8s_namespaces'], records['namespaces'])
+        self.state_cache.snapshot.assert_any_call('pods', 'test-ns')
+        mock_get_apis.return_value['cli'].pods.list.assert_not_called()
+        self.state_cache.start.assert_not_called()
+
+    @patch('modules.k8s.client.K8S_AVAILABLE', False)
+    @patch('modules.k8s.module.shutil.which', return_value='/usr/bin/kubectl')
+    @patch('modules.k8s.module.get_apis', return_value={'cli': MagicMock(**{'info.return_value': None})})
+    @patch('modules.k8s.module.run_command')
+    def test_k8s_module_logic(self, mock_run, mock_apis, mock_which):
+        from modules.k8s.module import Module
+        module = Module()
+
+        self.assertEqual(module.get_logs_url(self.tool), '/k8s/service/logs/')
+
+        # The version is cached, so each scenario starts from an empty cache
+        version_scenarios = [
+            ('client_version', b"Client Version: v1.29.1", "v1.29.1"),
+            ('git_version', b'GitVersion:"v1.29.15"', "v1.29.15"),
+            ('unparseable', b"Some Version 1.2.3", None),
+            ('error', Exception("version error"), None),
+        ]
+        for name, output, expected in version_scenarios:
+            with self.subTest(name):
+                cache.clear()
+                mock_run.reset_mock(return_value=True, side_effect=True)
+                if isinstance(output, Exception):
+                    mock_run.side_effect = output
+                else:
+                    mock_run.return_value = output
+                self.assertEqual(module.get_service_version(), expected)
+
+        # Without kubectl there is no version to report, and nothing is cached as one
+        with self.subTest('no_kubectl'):
+            cache.clear()
+            mock_run.reset_mock(return_value=True, side_effect=True)
+            mock_which.return_value = None
+            self.assertIsNone(module.get_service_version())
+            mock_run.assert_not_called()
+            mock_which.return_value = '/usr/bin/kubectl'
+
+        status_scenarios = [
+            ('active', b"active", "running"),
+            ('inactive', b"inactive", "stopped"),
+            ('error', Exception("status error"), "stopped"),
+        ]
+        for name, output, expected in status_scenarios:
+            with self.subTest(name):
+                cache.clear()
+                mock_run.reset_mock(return_value=True, side_effect=True)
+                if isinstance(output, Exception):
+                    mock_run.side_effect = output
+                else:
+                    mock_run.return_value = output
+                self.assertEqual(module.get_service_status(self.tool), expected)
+
+        mock_run.reset_mock(return_value=True, side_effect=True)
+        for action, method in (('start', module.service_start), ('stop', module.service_stop), ('restart', module.service_restart)):
+            with self.subTest(action):
+                method(self.tool)
+                mock_run.assert_called_with(["systemctl", action, "kubelet"])
+
+    @patch('modules.k8s.module.run_command')
+    def test_k8s_service_status_cached(self, mock_run):
+        from modules.k8s.module import Module
+        module = Module()
+
+        mock_run.return_value = b"active"
+        self.assertEqual(module.get_service_status(self.tool), "running")
+        mock_run.return_value = b"inactive"
+        self.assertEqual(module.get_service_status(self.tool), "running")
+        self.assertEqual(mock_run.call_count, 1)
+
+        # Service actions drop the cached status
+        module.service_stop(self.tool)
+        self.assertEqual(module.get_service_status(self.tool), "stopped")
+
+    @patch('kubernetes.client.VersionApi')
+    def test_k8s_module_version_api(self, mock_version):
+        from modules.k8s.module import Module
+        module = Module()
+        
+        mock_api = MagicMock()
+        mock_api.get_code.return_value.git_version = "v1.29.2"
+        mock_version.return_value = mock_api
+        
+        with patch('modules.k8s.client.get_kubeconfig', return_value='/tmp/config'):
+            self.assertEqual(module.get_service_version(), "v1.29.2")
+
+    @patch('modules.k8s.module.run_command')
+    def test_k8s_status_detection(self, mock_run):
+        mock_run.return_value = b"active"
+        from core.plugin_system import plugin_registry
+        module = plugin_registry.get_module("k8s")
+        status = module.get_service_status(self.tool)
+        self.assertEqual(status, "running")
+
+    @patch('modules.k8s.client.get_kubeconfig', return_value='/tmp/config')
+    @patch('modules.k8s.module.subprocess.Popen')
+    def test_k8s_session(self, mock_popen, mock_get_cfg):
+        from modules.k8s.module import K8sSession
+        import socket
+        # A socketpair stands in for the PTY; our end plays kubectl, so output and EOF
+        # drive run() to completion without any timing
+        ours, theirs = socket.socketpair()
+        with patch('modules.k8s.module.pty.openpty', return_value=(theirs.detach(), os.dup(ours.fileno()))):
+            session = K8sSession("default", "test-pod")
+
+        session.send_input("ls")
+        self.assertEqual(ours.recv(16), b"ls")
+
+        ours.sendall(b"output")
+        ours.shutdown(socket.SHUT_WR)
+        session.run()
+        ours.close()
+
+        self.assertTrue(any(b"output" in h for h in session.history))
+        self.assertEqual(mock_popen.call_args[0][0][:2], ['kubectl', 'exec'])
+
+    @patch('modules.k8s.client.get_kubeconfig', return_value='/tmp/config')
+    @patch('kubernetes.client.CoreV1Api')
+    def test_k8s_connectivity_error_caching(self, mock_v1, mock_get_cfg):
+        from modules.k8s.module import Module
+        module = Module()
+        
+        mock_api = MagicMock()
+        mock_api.list_namespace.side_effect = Exception("Connection refused")
+        mock_v1.return_value = mock_api
+        
+        request = NonCallableMagicMock()
+        request.GET = {}
+        
+        # First call - should set cache
+        with self.assertLogs('modules.k8s.module', level='ERROR') as cm:
+            context = module.get_context_data(request, self.tool)
+            self.assertIn("Connection refused", context['k8s_error'])
+        
+        # Second call - should use cache
+        mock_api.list_namespace.reset_mock()
+        context = module.get_context_data(request, self.tool)
+        self.assertIn("(cached)", context['k8s_error'])
+        mock_api.list_namespace.assert_not_called()
+
+    @patch('modules.k8s.client.get_kubeconfig', return_value='/tmp/config')
+    @patch('kubernetes.client.CoreV1Api')
+    def test_k8s_probing_flag(self, mock_v1, mock_get_cfg):
+        from modules.k8s.module import Module
+        module = Module()
+        
+        cache.set(f'k8s_probing_{self.tool.id}', True)
+        context = module.get_context_data(NonCallableMagicMock(), self.tool)
+        self.assertTrue(context.get('is_probing'))
+        
+        response = module.handle_hx_request(NonCallableMagicMock(), self.tool, 'k8s_pods')
+        self.assertEqual(response.status_code, 204)
+
+    @patch('modules.k8s.client.K8S_AVAILABLE', False)
+    @patch('modules.k8s.client.get_kubeconfig', return_value='/tmp/config')
+    @patch('modules.k8s.client.K8sCLI')
+    def test_k8s_not_available(self, mock_cli, mock_get_cfg):
+        # Without the Python client the listings still come through the CLI wrapper
+        cli = mock_cli.return_value
+        cli.get_namespaces.return_value = ['default']
+        for kind in ('pods', 'deployments', 'services', 'configmaps', 'secrets', 'events', 'nodes'):
+            getattr(cli, kind).list.return_value = []
+        from modules.k8s.module import Module
+        module = Module()
+        context = module.get_context_data(None, self.tool)
+        self.assertNotIn('k8s_error', context)
+        self.assertTrue(context['k8s_available'])
+        self.assertEqual(context['k8s_namespaces'], ['default'])
+        cli.pods.list.assert_called_once_with(all_namespaces=True)
+
+    @patch('modules.k8s.client.get_kubeconfig', return_value=None)
+    def test_k8s_no_config(self, mock_get_cfg):
+        from modules.k8s.module import Module
+        module = Module()
+        context = module.get_context_data(NonCallableMagicMock(), self.tool)
+        self.assertIn("No readable kubeconfig", context['k8s_error'])
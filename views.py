@@ -1,33 +1,244 @@
+import json
 import subprocess
 import os
+import re
+import shlex
+import shutil
+import tempfile
+import time
+import uuid
 import yaml
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from yaml import CSafeDumper as _SafeDumper, CSafeLoader as _SafeLoader
+except ImportError:
+    from yaml import SafeDumper as _SafeDumper, SafeLoader as _SafeLoader
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from core.utils import run_command, get_primary_ip, devops_admin_required
-from core.k8s_cli_wrapper import K8sCLI, get_kubeconfig
+from django.core.cache import cache
+from .client import REQUEST_TIMEOUT, get_apis, get_kubeconfig_cached
+from .informer import state_cache
+
+# Chunk size for streamed log downloads
+LOG_CHUNK_SIZE = 1024 * 1024
+# Lines shown by the log viewer; a shorter tail is the whole log, which the download can reuse
+LOG_TAIL_LINES = 200
+# How long such a complete log is kept for the download that usually follows
+LOG_REUSE_TTL = 30
+
+# Kinds the YAML editor can open, mapped to the mirrored kind whose resourceVersion keys
+# the YAML cache; anything else is rejected without running kubectl. Secrets map to None
+# so their values are never written to the shared cache.
+_YAML_RESOURCE_TYPES = {
+    'pod': 'pods',
+    'deployment': 'deployments',
+    'service': 'services',
+    'configmap': 'configmaps',
+    'secret': None,
+}
+
+# resource type -> (api name, read method, kind) for objects read through the in-process client
+_RESOURCE_READERS = {
+    'pod': ('v1', 'read_namespaced_pod', 'Pod'),
+    'deployment': ('apps', 'read_namespaced_deployment', 'Deployment'),
+    'service': ('v1', 'read_namespaced_service', 'Service'),
+    'configmap': ('v1', 'read_namespaced_config_map', 'ConfigMap'),
+    'secret': ('v1', 'read_namespaced_secret', 'Secret'),
+}
+# Secret describes are left to kubectl, which prints value sizes rather than the values
+_DESCRIBE_TYPES = frozenset(_RESOURCE_READERS) - {'secret'}
+
+# Units whose journal may hold the cluster logs, in order of preference
+_JOURNAL_SERVICES = ('kubelet', 'k3s', 'microk8s')
+# One worker per unit so the journal probes run side by side
+_JOURNAL_POOL = ThreadPoolExecutor(max_workers=len(_JOURNAL_SERVICES), thread_name_prefix='k8s-journal')
+# Only one of them is installed on a host, so the unit that answered is remembered
+_JOURNAL_SERVICE_KEY = 'k8s_journal_svc'
+JOURNAL_SERVICE_TTL = 3600
+# Upper bound for the kubeadm phases k8s_repair_ip runs, so a hung one cannot hold the worker
+KUBEADM_TIMEOUT = 120
+
+# Default window of the journal download
+JOURNAL_DOWNLOAD_SINCE = '-1h'
+
+# Flags that already scope a terminal `kubectl get`, so no -A is added
+_NAMESPACE_FLAGS = frozenset({'-n', '--namespace', '-A', '--all-namespaces'})
+
+# kubectl apply runs here so the request that submitted it returns immediately
+_APPLY_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix='k8s-apply')
+# How long an apply's outcome stays available to k8s_apply_status
+APPLY_STATUS_TTL = 300
+# Cache backends private to one process; a status poll served by another worker could not see the job
+_PROCESS_LOCAL_CACHES = frozenset({
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+})
+# (connect, read) timeout for a server-side apply, which can take a while for large objects
+APPLY_TIMEOUT = (2, 30)
+APPLY_FIELD_MANAGER = 'solsticeops'
+# kind -> resource plural for the kinds the editor applies through the API server directly
+_APPLY_PLURALS = {
+    'Pod': 'pods',
+    'Deployment': 'deployments',
+    'Service': 'services',
+    'ConfigMap': 'configmaps',
+    'Secret': 'secrets',
+}
+
+# How long a rendered resource YAML is kept; a new resourceVersion changes the key anyway
+YAML_CACHE_TTL = 300
+
+# Manifest flags rewritten by k8s_repair_ip, compiled once instead of forking sed per flag
+_ADV = re.compile(rb'--advertise-address=[0-9.]*')
+_ADV_CLIENT = re.compile(rb'--advertise-client-urls=https://[0-9.]+')
+_LISTEN_CLIENT = re.compile(rb'--listen-client-urls=https://127\.0\.0\.1:2379,https://[0-9.]+')
+
+def _rewrite_manifest(path, substitutions):
+    # Single read/modify/write pass; os.replace keeps the kubelet from ever seeing a half-written manifest
+    with open(path, 'rb') as f:
+        data = f.read()
+    for pattern, repl in substitutions:
+        data = pattern.sub(repl, data)
+    # The kubelet ignores dotfiles in the static-pod directory, so a leftover temp file is never
+    # loaded as a second pod; same directory keeps os.replace on one filesystem
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.' + os.path.basename(path) + '.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        # Keep the manifest's mode and owner, as sed -i did
+        st = os.stat(path)
+        shutil.copystat(path, tmp)
+        os.chown(tmp, st.st_uid, st.st_gid)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+# Absolute paths of the CLIs the views exec, so each spawn skips execvp's PATH walk.
+# Only hits are kept, so a binary installed after startup (kubectl by the installer) is still found.
+_BINARY_PATHS = {}
+
+def _binary(name):
+    path = _BINARY_PATHS.get(name)
+    if path is None:
+        path = shutil.which(name)
+        if path is None:
+            return name
+        _BINARY_PATHS[name] = path
+    return path
+
+# kubeconfig path -> environment for kubectl, so os.environ is copied once per path, not per spawn
+_KUBECTL_ENVS = {}
+
+def _kubectl_env():
+    """Returns the shared kubectl environment; callers must copy it before changing anything."""
+    # The kubeconfig path is resolved through the shared 30s cache rather than rescanned per request
+    kconfig = get_kubeconfig_cached()
+    env = _KUBECTL_ENVS.get(kconfig)
+    if env is None:
+        env = os.environ.copy()
+        if kconfig:
+            env['KUBECONFIG'] = kconfig
+        # A different kubeconfig replaces the old entry rather than accumulating
+        _KUBECTL_ENVS.clear()
+        _KUBECTL_ENVS[kconfig] = env
+    return env
+
+def _known_missing(kind, namespace, name):
+    # The watch mirror answers existence checks locally; None (not synced) means ask the API server.
+    # It can trail the cluster briefly, so only read paths use it; writes let the API server decide.
+    return state_cache.contains(get_kubeconfig_cached(), kind, namespace, name) is False
 
 @login_required
 def k8s_pod_logs(request, namespace, pod_name):
     try:
-        k8s = K8sCLI()
-        pod = k8s.pods.get(name=pod_name, namespace=namespace)
-        if not pod:
+        if _known_missing('pods', namespace, pod_name):
             return HttpResponse("Pod not found", status=404)
-        logs = pod.logs(tail=200)
+        apis = get_apis()
+        if 'v1' in apis:
+            # Read the log directly rather than fetching the pod first only to confirm it exists
+            try:
+                logs = apis['v1'].read_namespaced_pod_log(name=pod_name, namespace=namespace, tail_lines=LOG_TAIL_LINES,
+                                                          _request_timeout=REQUEST_TIMEOUT)
+            except Exception as e:
+                if getattr(e, 'status', None) == 404:
+                    return HttpResponse("Pod not found", status=404)
+                raise
+        else:
+            pod = apis['cli'].pods.get(name=pod_name, namespace=namespace)
+            if not pod:
+                return HttpResponse("Pod not found", status=404)
+            logs = pod.logs(tail=LOG_TAIL_LINES)
+        # splitlines counts a final line without a trailing newline, so a full tail is never taken as complete
+        if len(logs.splitlines()) < LOG_TAIL_LINES:
+            cache.set(f'k8s_pod_log_{namespace}_{pod_name}', logs, LOG_REUSE_TTL)
         return HttpResponse(logs, content_type='text/plain')
     except Exception as e:
         return HttpResponse(f"Error: {str(e)}", status=500)
 
+_DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+def _parse_duration(value):
+    """Parses '90', '30m' or '2h' into seconds; raises ValueError for anything else."""
+    multiplier = _DURATION_UNITS.get(value[-1:], None)
+    seconds = int(value[:-1] if multiplier else value) * (multiplier or 1)
+    if seconds <= 0:
+        raise ValueError(value)
+    return seconds
+
+def _stream_pod_log(resp):
+    try:
+        yield from resp.stream(LOG_CHUNK_SIZE)
+    finally:
+        resp.release_conn()
+
 @login_required
 def k8s_pod_logs_download(request, namespace, pod_name):
+    # ?tail=<lines> and ?since=<seconds, or 30m/2h/1d> let the API server slice the log
+    try:
+        window = {}
+        if request.GET.get('tail'):
+            window['tail_lines'] = int(request.GET['tail'])
+            if window['tail_lines'] <= 0:
+                raise ValueError(request.GET['tail'])
+        if request.GET.get('since'):
+            window['since_seconds'] = _parse_duration(request.GET['since'])
+    except ValueError:
+        return HttpResponse("tail must be a positive line count and since a duration such as 600, 30m or 2h", status=400)
+
     try:
-        k8s = K8sCLI()
-        pod = k8s.pods.get(name=pod_name, namespace=namespace)
-        if not pod:
+        if _known_missing('pods', namespace, pod_name):
             return HttpResponse("Pod not found", status=404)
-        logs = pod.logs()
-        response = HttpResponse(logs, content_type='text/plain')
+        apis = get_apis()
+        # A reused tail is the whole log, so it only stands in for an unsliced download
+        logs = None if window else cache.get(f'k8s_pod_log_{namespace}_{pod_name}')
+        if logs is not None:
+            # The viewer just fetched the entire log, so don't have the API server send it again
+            response = HttpResponse(logs, content_type='text/plain')
+        elif 'v1' in apis:
+            # Stream the log straight from the API server so memory stays flat however large it is
+            try:
+                resp = apis['v1'].read_namespaced_pod_log(name=pod_name, namespace=namespace, _preload_content=False, **window)
+            except Exception as e:
+                if getattr(e, 'status', None) == 404:
+                    return HttpResponse("Pod not found", status=404)
+                raise
+            response = StreamingHttpResponse(_stream_pod_log(resp), content_type='text/plain')
+        else:
+            pod = apis['cli'].pods.get(name=pod_name, namespace=namespace)
+            if not pod:
+                return HttpResponse("Pod not found", status=404)
+            # The CLI wrapper only takes a line count
+            logs = pod.logs(tail=window['tail_lines']) if 'tail_lines' in window else pod.logs()
+            response = HttpResponse(logs, content_type='text/plain')
         response['Content-Disposition'] = f'attachment; filename="pod_{pod_name}_logs.log"'
         return response
     except Exception as e:
@@ -36,11 +247,12 @@ def k8s_pod_logs_download(request, namespace, pod_name):
 @login_required
 @devops_admin_required
 def k8s_pod_action(request, namespace, pod_name, action):
+    # Delete is the only action; anything else returns before touching the client
+    if action != 'delete':
+        return redirect('tool_detail', tool_name='k8s')
 
     try:
-        k8s = K8sCLI()
-        if action == 'delete':
-            k8s.pods.delete(name=pod_name, namespace=namespace)
+        get_apis()['cli'].pods.delete(name=pod_name, namespace=namespace)
     except Exception as e:
         pass
     
@@ -50,7 +262,7 @@ def k8s_pod_action(request, namespace, pod_name, action):
 @devops_admin_required
 def k8s_deployment_scale(request, namespace, name, replicas):
     try:
-        k8s = K8sCLI()
+        k8s = get_apis()['cli']
         k8s.deployments.scale(name=name, namespace=namespace, replicas=replicas)
         return redirect('tool_detail', tool_name='k8s')
     except Exception as e:
@@ -60,21 +272,52 @@ def k8s_deployment_scale(request, namespace, name, replicas):
 @devops_admin_required
 def k8s_deployment_restart(request, namespace, name):
     try:
-        k8s = K8sCLI()
+        k8s = get_apis()['cli']
         k8s.deployments.restart(name=name, namespace=namespace)
         return redirect('tool_detail', tool_name='k8s')
     except Exception as e:
         return HttpResponse(str(e), status=500)
 
+def _read_resource(apis, resource_type, namespace, name):
+    """Returns the object as a plain dict without managedFields, as kubectl shows it."""
+    api_name, method, _ = _RESOURCE_READERS[resource_type]
+    # Raw JSON skips building client models only to walk them back into dicts
+    resp = getattr(apis[api_name], method)(name=name, namespace=namespace, _request_timeout=REQUEST_TIMEOUT,
+                                           _preload_content=False)
+    data = json.loads(resp.data)
+    data.get('metadata', {}).pop('managedFields', None)
+    return data
+
+def _to_yaml(data):
+    return yaml.dump(data, Dumper=_SafeDumper, default_flow_style=False, sort_keys=False)
+
+def _describe(apis, resource_type, namespace, name):
+    """Renders the object and its events through the shared ApiClient instead of a kubectl describe."""
+    data = _read_resource(apis, resource_type, namespace, name)
+    kind = _RESOURCE_READERS[resource_type][2]
+    events = apis['v1'].list_namespaced_event(
+        namespace, field_selector=f'involvedObject.name={name},involvedObject.kind={kind}',
+        _request_timeout=REQUEST_TIMEOUT
+    ).items
+    lines = [_to_yaml(data), 'Events:']
+    if not events:
+        lines.append('  <none>')
+    for e in events:
+        lines.append(f"  {e.type or '':<8} {e.reason or '':<24} {e.message or ''}".rstrip())
+    return '\n'.join(lines) + '\n'
+
 @login_required
 def k8s_resource_describe(request, resource_type, namespace, name):
     try:
-        kconfig = get_kubeconfig()
-        env = os.environ.copy()
-        if kconfig:
-            env['KUBECONFIG'] = kconfig
+        if resource_type in _DESCRIBE_TYPES and namespace:
+            apis = get_apis()
+            if 'v1' in apis:
+                return HttpResponse(_describe(apis, resource_type, namespace, name))
+
+        # Other kinds, or no Python client: fall back to kubectl
+        env = _kubectl_env()
 
-        cmd = ['kubectl', 'describe', resource_type, name]
+        cmd = [_binary('kubectl'), 'describe', resource_type, name]
         if namespace:
             cmd.extend(['-n', namespace])
         
@@ -83,12 +326,71 @@ def k8s_resource_describe(request, resource_type, namespace, name):
     except Exception as e:
         return HttpResponse(str(e), status=500)
 
+def _apply_path(doc):
+    """Returns the REST path to server-side apply doc to, or None if it is not a namespaced kind we know."""
+    if not isinstance(doc, dict):
+        return None
+    plural = _APPLY_PLURALS.get(doc.get('kind'))
+    meta = doc.get('metadata') or {}
+    api_version = doc.get('apiVersion')
+    if not plural or not api_version or not meta.get('name') or not meta.get('namespace'):
+        return None
+    prefix = f'/apis/{api_version}' if '/' in api_version else f'/api/{api_version}'
+    return f"{prefix}/namespaces/{meta['namespace']}/{plural}/{meta['name']}"
+
+def _error_message(e):
+    # ApiException bodies carry the API server's Status object; its message is what kubectl would print
+    try:
+        return json.loads(e.body)['message']
+    except (AttributeError, TypeError, ValueError, KeyError):
+        return str(e)
+
+def _cache_is_shared():
+    return settings.CACHES.get('default', {}).get('BACKEND') not in _PROCESS_LOCAL_CACHES
+
+def _apply_outcome(yaml_bytes, env):
+    """Applies the YAML, returning (status, message) for the editor."""
+    try:
+        apis = get_apis()
+        docs = list(yaml.load_all(yaml_bytes, Loader=_SafeLoader)) if 'api_client' in apis else []
+        path = _apply_path(docs[0]) if len(docs) == 1 else None
+        if path:
+            # One server-side apply PATCH on the pooled connection instead of starting kubectl.
+            # A save from the editor is explicit intent, like kubectl apply --server-side --force-conflicts,
+            # so fields set earlier by kubectl, scale or Helm are taken over rather than refused
+            apis['api_client'].call_api(
+                path, 'PATCH', query_params=[('fieldManager', APPLY_FIELD_MANAGER), ('force', 'true')],
+                header_params={'Content-Type': 'application/apply-patch+yaml', 'Accept': 'application/json'},
+                body=docs[0], auth_settings=['BearerToken'], _return_http_data_only=True,
+                _preload_content=False, _request_timeout=APPLY_TIMEOUT
+            )
+        else:
+            # Multi-document input, other kinds, or no Python client
+            run_command([_binary('kubectl'), 'apply', '-f', '-'], input_data=yaml_bytes, env=env)
+        return 200, "Resource updated successfully."
+    except Exception as e:
+        return 500, f"Update failed: {_error_message(e)}"
+
+def _apply_yaml(status_key, yaml_bytes, env):
+    # Outcomes go through the shared cache so any worker process can answer the status poll
+    cache.set(status_key, _apply_outcome(yaml_bytes, env), APPLY_STATUS_TTL)
+
+@login_required
+def k8s_apply_status(request, job_id):
+    """Reports a queued apply: 202 while kubectl is still running, then its final status and message."""
+    outcome = cache.get(f'k8s_apply_{job_id}')
+    if outcome is None:
+        return HttpResponse("Unknown apply job", status=404)
+    status, message = outcome
+    return HttpResponse(message, status=status)
+
 @login_required
 def k8s_resource_yaml(request, resource_type, namespace, name):
-    kconfig = get_kubeconfig()
-    env = os.environ.copy()
-    if kconfig:
-        env['KUBECONFIG'] = kconfig
+    # Reject unknown kinds before building an environment or spawning kubectl
+    if resource_type not in _YAML_RESOURCE_TYPES:
+        return HttpResponse(f"Unsupported resource type: {resource_type}", status=400)
+
+    env = _kubectl_env()
 
     try:
         if request.method == 'POST':
@@ -96,20 +398,43 @@ def k8s_resource_yaml(request, resource_type, namespace, name):
             if not request.user.can_manage_infrastructure:
                 return HttpResponse("Permission denied: DevOps Admin role required.", status=403)
                 
-            new_yaml_str = request.POST.get('yaml')
-            try:
-                # Use run_command for apply
-                run_command(['kubectl', 'apply', '-f', '-'], input_data=new_yaml_str.encode(), env=env)
-                return HttpResponse("Resource updated successfully.", status=200)
-            except Exception as e:
-                return HttpResponse(f"Update failed: {str(e)}", status=500)
+            new_yaml_str = request.POST.get('yaml', '')
+            if not _cache_is_shared():
+                # With a per-process cache a poll landing on another worker would never find the job,
+                # so the apply runs within this request instead
+                status, message = _apply_outcome(new_yaml_str.encode(), env)
+                return HttpResponse(message, status=status)
+            # A server-side apply can take seconds, so queue it and let the editor poll for the outcome
+            job_id = uuid.uuid4().hex
+            status_key = f'k8s_apply_{job_id}'
+            cache.set(status_key, (202, "Apply in progress."), APPLY_STATUS_TTL)
+            _APPLY_POOL.submit(_apply_yaml, status_key, new_yaml_str.encode(), env)
+            status_url = reverse('k8s_apply_status', kwargs={'job_id': job_id})
+            response = JsonResponse({'id': job_id, 'status_url': status_url}, status=202)
+            response['Location'] = status_url
+            return response
 
-        # Get YAML using kubectl
-        cmd = ['kubectl', 'get', resource_type, name, '-o', 'yaml']
-        if namespace:
-            cmd.extend(['-n', namespace])
-        
-        yaml_content = run_command(cmd, env=env).decode()
+        # Objects only change with their resourceVersion, which the watch mirror already knows,
+        # so a repeat GET of an unchanged object is served without reading it again
+        kind = _YAML_RESOURCE_TYPES[resource_type]
+        rv = state_cache.resource_version(get_kubeconfig_cached(), kind, namespace, name) if kind else None
+        cache_key = f'k8s_yaml:{resource_type}:{namespace}:{name}:{rv}'
+        if rv:
+            yaml_content = cache.get(cache_key)
+            if yaml_content is not None:
+                return HttpResponse(yaml_content)
+
+        apis = get_apis()
+        if 'v1' in apis and namespace:
+            yaml_content = _to_yaml(_read_resource(apis, resource_type, namespace, name))
+        else:
+            # No Python client: get YAML using kubectl, passing its bytes through as they are
+            cmd = [_binary('kubectl'), 'get', resource_type, name, '-o', 'yaml']
+            if namespace:
+                cmd.extend(['-n', namespace])
+            yaml_content = run_command(cmd, env=env)
+        if rv:
+            cache.set(cache_key, yaml_content, YAML_CACHE_TTL)
         return HttpResponse(yaml_content)
     except Exception as e:
         return HttpResponse(str(e), status=500)
@@ -123,26 +448,33 @@ def k8s_terminal_run(request):
         namespace = request.POST.get('namespace')
         pod = request.POST.get('pod')
 
-        kconfig = get_kubeconfig()
-        env = os.environ.copy()
-        if kconfig:
-            env['KUBECONFIG'] = kconfig
+        env = _kubectl_env()
 
         if pod and namespace:
-            full_command = f"kubectl exec -n {namespace} {pod} -- {command}"
+            try:
+                words = shlex.split(command)
+            except ValueError as e:
+                # Unbalanced quotes and the like are reported like any other terminal error
+                return HttpResponse(f"Error: {str(e)}")
+            argv = [_binary('kubectl'), 'exec', '-n', namespace, pod, '--'] + words
             display_prompt = f"# {command}"
         else:
             # Check for admin role on non-read-only kubectl commands if needed
             # But k8s_terminal_run is already @devops_admin_required, so we are safe.
-            if not command.startswith('kubectl'):
-                command = 'kubectl ' + command
-            if ' get ' in command and not any(x in command for x in [' -n ', ' --namespace', ' -A', ' --all-namespaces']):
-                command += ' -A'
-            full_command = command
-            display_prompt = f"$ {command}"
+            try:
+                tokens = shlex.split(command)
+            except ValueError as e:
+                return HttpResponse(f"Error: {str(e)}")
+            if not tokens or tokens[0] != 'kubectl':
+                tokens.insert(0, 'kubectl')
+            if 'get' in tokens and not any(t in _NAMESPACE_FLAGS or t.startswith('--namespace=') for t in tokens):
+                tokens.append('-A')
+            argv = [_binary('kubectl')] + tokens[1:]
+            display_prompt = f"$ {shlex.join(tokens)}"
         
         try:
-            output = run_command(full_command, shell=True, env=env).decode()
+            # kubectl is exec'd directly; no /bin/sh in between to fork or to interpret the input
+            output = run_command(argv, env=env).decode()
             return HttpResponse(f"{display_prompt}\n{output}")
         except subprocess.CalledProcessError as e:
             return HttpResponse(f"{display_prompt}\nError: {e.output.decode() if e.output else str(e)}")
@@ -157,68 +489,130 @@ def k8s_pod_shell(request, namespace, pod_name):
         return HttpResponse("Permission denied: DevOps Admin role required.", status=403)
     return HttpResponse("Shell initialised")
 
+def _probe_journal(service):
+    """Returns the service's last 200 journal lines, or "" if it has none."""
+    try:
+        output = run_command([_binary('journalctl'), '-u', service, '-n', '200', '--no-pager']).decode()
+    except subprocess.CalledProcessError:
+        return ""
+    return output if output.strip() and "No entries" not in output else ""
+
+def _read_journal():
+    """Returns (unit, last 200 journal lines) for the unit holding the cluster logs, or (None, "")."""
+    cached = cache.get(_JOURNAL_SERVICE_KEY)
+    if cached:
+        output = _probe_journal(cached)
+        if output:
+            return cached, output
+    # Usually only one unit exists, so probe all of them at once and keep the first in
+    # preference order that has entries; the request waits on the slowest probe, not their sum
+    futures = [_JOURNAL_POOL.submit(_probe_journal, service) for service in _JOURNAL_SERVICES]
+    for service, future in zip(_JOURNAL_SERVICES, futures):
+        output = future.result()
+        if output:
+            cache.set(_JOURNAL_SERVICE_KEY, service, JOURNAL_SERVICE_TTL)
+            return service, output
+    return None, ""
+
 @login_required
 def k8s_service_logs(request):
     try:
-        # We'll try to find any relevant service logs
-        services = ['kubelet', 'k3s', 'microk8s']
-        output = ""
-        
-        for service in services:
-            try:
-                # Try journalctl with sudo
-                output = run_command(['journalctl', '-u', service, '-n', '200', '--no-pager']).decode()
-                if output.strip() and "No entries" not in output:
-                    break
-            except subprocess.CalledProcessError:
-                continue
-        
-        if not output.strip() or "No entries" in output:
+        _, output = _read_journal()
+        if not output:
             return HttpResponse("No log entries found. Ensure a Kubernetes service (kubelet, k3s, or microk8s) is running and accessible.", content_type='text/plain')
 
         return HttpResponse(output, content_type='text/plain')
     except Exception as e:
         return HttpResponse(f"Error fetching system logs: {str(e)}", status=500)
 
+def _spawn_journal(service, since):
+    cmd = [_binary('journalctl'), '-u', service, '--no-pager']
+    if since:
+        # Lets journald seek through its index instead of reading the unit's whole history
+        cmd.extend(['--since', since])
+    return subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+def _discard_journal(process):
+    process.stdout.close()
+    if process.poll() is None:
+        process.kill()
+    process.wait()
+
+def _has_entries(first):
+    return bool(first.strip()) and b"No entries" not in first
+
+def _open_journal(services, since=None):
+    """Returns (first chunk, process) for the first service with journal entries, or (b"", None)."""
+    cached = cache.get(_JOURNAL_SERVICE_KEY)
+    if cached in services:
+        process = _spawn_journal(cached, since)
+        first = process.stdout.read1(LOG_CHUNK_SIZE)
+        if _has_entries(first):
+            return first, process
+        _discard_journal(process)
+    # Start every remaining unit at once so the probe costs the slowest journal open, not their sum,
+    # then keep the first in preference order that has entries
+    candidates = [(service, _spawn_journal(service, since)) for service in services if service != cached]
+    found = None
+    for service, process in candidates:
+        if found is None:
+            first = process.stdout.read1(LOG_CHUNK_SIZE)
+            if _has_entries(first):
+                cache.set(_JOURNAL_SERVICE_KEY, service, JOURNAL_SERVICE_TTL)
+                found = (first, process)
+                continue
+        _discard_journal(process)
+    return found or (b"", None)
+
+def _stream_journal(first, process):
+    try:
+        yield first
+        yield from iter(lambda: process.stdout.read(LOG_CHUNK_SIZE), b'')
+    finally:
+        process.stdout.close()
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+
 @login_required
 def k8s_service_logs_download(request):
 
     try:
-        services = ['kubelet', 'k3s', 'microk8s']
-        output = ""
-        
-        for service in services:
-            try:
-                output = run_command(['journalctl', '-u', service, '--no-pager']).decode()
-                if output.strip() and "No entries" not in output:
-                    break
-            except subprocess.CalledProcessError:
-                continue
-        
-        response = HttpResponse(output, content_type='text/plain')
+        # ?since= takes any journalctl time spec; an empty value downloads the unit's whole journal
+        since = request.GET.get('since', JOURNAL_DOWNLOAD_SINCE)
+        first, process = _open_journal(_JOURNAL_SERVICES, since)
+        # The full journal can be large, so pass it through in chunks instead of buffering it
+        if process is None:
+            response = HttpResponse(first, content_type='text/plain')
+        else:
+            response = StreamingHttpResponse(_stream_journal(first, process), content_type='text/plain')
         response['Content-Disposition'] = 'attachment; filename="k8s_service_logs.log"'
         return response
     except Exception as e:
         return HttpResponse(f"Error downloading system logs: {str(e)}", status=500)
 
-
+def _run_concurrently(commands, timeout=KUBEADM_TIMEOUT):
+    """
+    Runs the commands side by side, raising CalledProcessError for the first that failed.
+    core's run_command blocks until its one command exits, so the processes are managed here;
+    all of them share one deadline, and whatever is still running when it passes is killed.
+    """
+    processes = []
     try:
-        services = ['kubelet', 'k3s', 'microk8s']
-        output = ""
-        
-        for service in services:
-            try:
-                output = run_command(['journalctl', '-u', service, '--no-pager']).decode()
-                if output.strip() and "No entries" not in output:
-                    break
-            except subprocess.CalledProcessError:
-                continue
-        
-        response = HttpResponse(output, content_type='text/plain')
-        response['Content-Disposition'] = 'attachment; filename="k8s_service_logs.log"'
-        return response
-    except Exception as e:
-        return HttpResponse(f"Error downloading system logs: {str(e)}", status=500)
+        for cmd in commands:
+            processes.append(subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT))
+        deadline = time.monotonic() + timeout
+        outputs = [process.communicate(timeout=max(0, deadline - time.monotonic()))[0] for process in processes]
+    finally:
+        # Reap everything that was started, including after a failed spawn or an expired deadline
+        for process in processes:
+            if process.returncode is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+    for cmd, process, output in zip(commands, processes, outputs):
+        if process.returncode:
+            raise subprocess.CalledProcessError(process.returncode, cmd, output=output)
 
 @login_required
 @devops_admin_required
@@ -236,49 +630,51 @@ def k8s_repair_ip(request):
         # 1. Update API server manifest
         apiserver_manifest = '/etc/kubernetes/manifests/kube-apiserver.yaml'
         if os.path.exists(apiserver_manifest):
-            run_command(['sed', '-i', f's/--advertise-address=[0-9.]*/--advertise-address={new_ip}/', apiserver_manifest])
+            _rewrite_manifest(apiserver_manifest, [
+                (_ADV, f'--advertise-address={new_ip}'.encode()),
+            ])
         
         # 2. Update etcd manifest if it exists and uses the old IP
         etcd_manifest = '/etc/kubernetes/manifests/etcd.yaml'
         if os.path.exists(etcd_manifest):
             # This is trickier as etcd uses multiple IPs for peer-urls etc.
             # But we can try to replace the listen-client-urls and advertise-client-urls
-            run_command(['sed', '-i', f's/--advertise-client-urls=https:\\/\\/[0-9.]*/--advertise-client-urls=https:\\/\\/{new_ip}/', etcd_manifest])
-            run_command(['sed', '-i', f's/--listen-client-urls=https:\\/\\/127.0.0.1:2379,https:\\/\\/[0-9.]*/--listen-client-urls=https:\\/\\/127.0.0.1:2379,https:\\/\\/{new_ip}/', etcd_manifest])
+            _rewrite_manifest(etcd_manifest, [
+                (_ADV_CLIENT, f'--advertise-client-urls=https://{new_ip}'.encode()),
+                (_LISTEN_CLIENT, f'--listen-client-urls=https://127.0.0.1:2379,https://{new_ip}'.encode()),
+            ])
 
-        # 3. Regenerate API server certificates
-        # We need to remove the old ones first
+        # 3 + 4. Regenerate API server certificates and the admin kubeconfig. Both phases only
+        # need the cluster CA, not each other's output, so the two kubeadm runs overlap.
+        phases = []
         cert_dir = '/etc/kubernetes/pki'
         if os.path.exists(cert_dir):
+            # We need to remove the old ones first
             for f in ['apiserver.crt', 'apiserver.key']:
                 p = os.path.join(cert_dir, f)
                 if os.path.exists(p):
                     os.remove(p)
-            
-            run_command(['kubeadm', 'init', 'phase', 'certs', 'apiserver', f'--apiserver-advertise-address={new_ip}'])
-
-        # 4. Regenerate kubeconfig
-        run_command(['kubeadm', 'init', 'phase', 'kubeconfig', 'admin', f'--apiserver-advertise-address={new_ip}'])
+            phases.append([_binary('kubeadm'), 'init', 'phase', 'certs', 'apiserver', f'--apiserver-advertise-address={new_ip}'])
+        phases.append([_binary('kubeadm'), 'init', 'phase', 'kubeconfig', 'admin', f'--apiserver-advertise-address={new_ip}'])
+        _run_concurrently(phases)
         
         # 5. Copy new config to root and current user if possible
         admin_conf = '/etc/kubernetes/admin.conf'
         if os.path.exists(admin_conf):
             dest = '/root/.kube/config'
             os.makedirs(os.path.dirname(dest), exist_ok=True)
-            # Use run_command with cp -f to avoid interactive prompts
-            run_command(['cp', '-f', admin_conf, dest])
+            shutil.copyfile(admin_conf, dest)
             os.chmod(dest, 0o644)
 
         # 6. Restart kubelet
-        run_command(['systemctl', 'restart', 'kubelet'])
+        run_command([_binary('systemctl'), 'restart', 'kubelet'])
         
         # Clear connectivity error cache
-        from django.core.cache import cache
         from core.models import Tool
         try:
             tool = Tool.objects.get(name='k8s')
             cache.delete(f'k8s_connectivity_error_{tool.id}')
-        except:
+        except Tool.DoesNotExist:
             pass
         
         return HttpResponse("Kubernetes configuration updated. Please wait a minute for components to restart.")